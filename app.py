@@ -1,12 +1,30 @@
+import os, sys
 
-import wx
-from ui.main_frame import BrowserFrame
+from core.timing import startup
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["batch"]:
+        # Headless path: must not pull in wx
+        from services.batch import main as batch_main
+        return batch_main(argv[1:])
+
+    timing = os.environ.get("PYWEB_TIMING")
+    for arg in argv:
+        if arg == "--timing" or arg.startswith("--timing="):
+            timing = arg.partition("=")[2] or "1"
+    if timing:
+        startup.enable(None if timing == "1" else timing)
+
+    import wx
+    from ui.main_frame import BrowserFrame
+    startup.mark("imports")
     app = wx.App(False)
     frame = BrowserFrame()
+    startup.mark("frame")
     frame.Show()
     app.MainLoop()
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Downloader throughput and overhead against the local stand-in server.
+
+    python -m bench.bench_downloader                      # every scenario, results to stdout
+    python -m bench.bench_downloader small huge -o run.json
+    python -m bench.bench_downloader --compare base.json run.json
+
+Each scenario downloads into a fresh temp directory and reports files/s, MB/s,
+peak threads, peak RSS and progress callbacks/s. The `ui` scenario also feeds
+every update through ProgressBus and DownloadListModel the way DownloadsPanel
+does, draining at FLUSH_HZ, and reports what reached the list. wx is not needed.
+"""
+import argparse, json, os, platform, subprocess, sys, tempfile, threading, time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, IO, List, Optional
+
+from bench.server import StandInServer, body_bytes
+from services.downloader import Downloader, DownloadItem
+from services.progress import ProgressBus, FLUSH_HZ
+from ui.download_model import DownloadListModel
+
+K, M = 1024, 1024*1024
+TERMINAL = ("done", "error", "canceled")
+SAMPLE_S = 0.01
+
+@dataclass
+class Scenario:
+    name: str
+    kind: str           # server route: file, norange, slow, flaky
+    count: int
+    size: int
+    query: Dict[str, int] = field(default_factory=dict)
+    ui: bool = False
+
+SCENARIOS = [
+    Scenario("small", "file", 2000, 16*K),
+    Scenario("huge", "file", 3, 128*M),
+    Scenario("norange", "norange", 3, 128*M),
+    Scenario("slow", "slow", 24, 1*M, {"rate": 512*K}),
+    Scenario("flaky", "flaky", 300, 64*K),
+    Scenario("ui", "file", 2000, 64*K, ui=True),
+]
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+class Sampler:
+    """Polls thread count and resident memory on a background thread, keeping the peaks."""
+
+    def __init__(self):
+        self.peak_threads = threading.active_count()
+        self.peak_rss = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_S):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            rss = rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def __enter__(self):
+        self._thread.start(); return self
+
+    def __exit__(self, *exc):
+        self._stop.set(); self._thread.join()
+
+def run_scenario(srv: StandInServer, sc: Scenario, jobs: int, per_host: int, segments: int,
+                 verify: bool = True) -> dict:
+    lock, finished = threading.Lock(), threading.Event()
+    remaining, callbacks, statuses = [sc.count], [0], {}
+    bus = model = None
+    ui = {"status_events": 0, "drained": 0, "drains": 0, "drain_max_ms": 0.0, "row_updates": 0}
+
+    def on_update(it: DownloadItem):
+        callbacks[0] += 1
+        if bus is not None:
+            bus.post(it)
+        if it.status in TERMINAL:
+            with lock:
+                statuses[it.status] = statuses.get(it.status, 0) + 1
+                remaining[0] -= 1
+                if remaining[0] <= 0:
+                    finished.set()
+
+    def refresh(it: DownloadItem):
+        # What DownloadsPanel._refresh_item does, minus the wx repaint
+        with lock:
+            if not model.update(it) and model.row_of(it) is not None:
+                ui["row_updates"] += 1
+
+    def on_status(it: DownloadItem):
+        ui["status_events"] += 1
+        refresh(it)
+
+    def drain_loop():
+        while not finished.wait(1 / FLUSH_HZ):
+            t = time.perf_counter()
+            items = bus.drain()
+            for it in items:
+                refresh(it)
+            ui["drains"] += 1; ui["drained"] += len(items)
+            ui["drain_max_ms"] = max(ui["drain_max_ms"], (time.perf_counter() - t) * 1000)
+
+    if sc.ui:
+        bus, model = ProgressBus(on_status=on_status), DownloadListModel()
+
+    with tempfile.TemporaryDirectory(prefix="pyweb-bench-") as dest_dir:
+        dl = Downloader(on_update, max_workers=jobs, per_host=per_host, segments=segments)
+        items = []
+        for i in range(sc.count):
+            url = srv.url(sc.kind, sc.size, f"{sc.name}-{i}.bin", **sc.query)
+            items.append(DownloadItem(url=url, dest=dl.destination(url, dest_dir)))
+        if model is not None:
+            for it in items:
+                model.add(it)
+        drainer = threading.Thread(target=drain_loop, daemon=True) if sc.ui else None
+        with Sampler() as sampler:
+            t0 = time.perf_counter()
+            if drainer:
+                drainer.start()
+            for it in items:
+                dl.start(it)
+            finished.wait()
+            wall = time.perf_counter() - t0
+        if drainer:
+            drainer.join()
+        dl.shutdown()
+        done = [it for it in items if it.status == "done"]
+        bad = 0
+        if verify:
+            # Spot-check content: the first and last finished files, byte for byte
+            for it in done[:1] + done[-1:]:
+                name = it.url.rsplit('/', 1)[1].split('?')[0]
+                with open(it.dest, 'rb') as f:
+                    bad += f.read() != body_bytes(name, 0, sc.size - 1)
+
+    nbytes = len(done) * sc.size
+    result = {
+        "scenario": sc.name, "route": sc.kind, "files": sc.count, "file_bytes": sc.size,
+        "jobs": jobs, "per_host": per_host, "segments": segments,
+        "statuses": statuses, "wall_s": round(wall, 3),
+        "files_per_s": round(len(done) / wall, 1), "mb_per_s": round(nbytes / M / wall, 2),
+        "peak_threads": sampler.peak_threads, "peak_rss_mb": round((sampler.peak_rss or 0) / M, 1),
+        "callbacks": callbacks[0], "callbacks_per_s": round(callbacks[0] / wall, 1),
+        "corrupt": bad,
+    }
+    if sc.ui:
+        result["ui"] = dict(ui, posted=bus.posted, drain_max_ms=round(ui["drain_max_ms"], 2),
+                            list_updates_per_s=round((ui["status_events"] + ui["drained"]) / wall, 1))
+    return result
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(base: dict, new: dict, out: IO[str]) -> None:
+    """Print per-scenario ratios new/base for the headline numbers."""
+    old = {r["scenario"]: r for r in base["results"]}
+    keys = ("files_per_s", "mb_per_s", "peak_threads", "peak_rss_mb", "callbacks_per_s")
+    out.write(f"{'scenario':10}" + "".join(f"{k:>18}" for k in keys) + "\n")
+    for r in new["results"]:
+        o = old.get(r["scenario"])
+        if not o:
+            continue
+        cells = []
+        for k in keys:
+            a, b = o.get(k) or 0, r.get(k) or 0
+            cells.append(f"{b:>10} ({b / a:4.2f}x)" if a else f"{b:>18}")
+        out.write(f"{r['scenario']:10}" + "".join(f"{c:>18}" for c in cells) + "\n")
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m bench.bench_downloader", description=__doc__.split("\n\n")[0])
+    p.add_argument("scenarios", nargs="*", help=f"any of {', '.join(s.name for s in SCENARIOS)} (default: all)")
+    p.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    p.add_argument("-j", "--jobs", type=int, default=6)
+    p.add_argument("--per-host", type=int, help="per-host cap (default: --jobs, everything is on one host)")
+    p.add_argument("--segments", type=int, default=4)
+    p.add_argument("--scale", type=float, default=1.0, help="multiply file counts, e.g. 0.1 for a quick run")
+    p.add_argument("--seed", type=int, default=1, help="seed for the flaky endpoint")
+    p.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files and exit")
+    return p
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            compare(json.load(a), json.load(b), sys.stdout)
+        return 0
+    by_name = {s.name: s for s in SCENARIOS}
+    unknown = [n for n in args.scenarios if n not in by_name]
+    if unknown:
+        print(f"unknown scenario: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    chosen = [by_name[n] for n in args.scenarios] or SCENARIOS
+    run = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_rev(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "args": {k: v for k, v in vars(args).items() if k != "compare"}},
+        "results": [],
+    }
+    with StandInServer(seed=args.seed) as srv:
+        for sc in chosen:
+            sc = Scenario(**dict(asdict(sc), count=max(1, round(sc.count * args.scale))))
+            r = run_scenario(srv, sc, args.jobs, args.per_host or args.jobs, args.segments)
+            run["results"].append(r)
+            print(f"{r['scenario']:8} {r['files_per_s']:>8} files/s {r['mb_per_s']:>8} MB/s "
+                  f"{r['peak_threads']:>4} threads {r['peak_rss_mb']:>7} MB rss "
+                  f"{r['callbacks_per_s']:>9} cb/s  {r['statuses']}", file=sys.stderr)
+        run["meta"]["requests"] = dict(srv.requests)
+    text = json.dumps(run, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
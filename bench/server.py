@@ -0,0 +1,173 @@
+"""Local HTTP stand-in for downloader benchmarks.
+
+Bodies are generated, not read from disk, so any size costs no setup:
+
+    /file/<size>/<name>      range support, ETag, Content-Length
+    /norange/<size>/<name>   ignores Range and advertises no Accept-Ranges
+    /slow/<size>/<name>      like /file, throttled to ?rate=<bytes/s> per response
+    /flaky/<size>/<name>     per request: 503, a body cut off halfway, or the file;
+                             chosen by a seeded RNG so runs are repeatable
+
+<size> takes a K/M/G suffix. Served bytes are a function of (name, offset), so
+a ranged or resumed download is byte-identical to a whole one.
+"""
+import hashlib, http.server, random, re, socket, sys, threading, time
+from typing import Optional, Tuple
+
+BLOCK = 1024*1024
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)$")
+_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3}
+
+def parse_size(text: str) -> int:
+    m = re.fullmatch(r"(\d+)([KMG]?)", text.upper())
+    if not m:
+        raise ValueError(f"bad size {text!r}")
+    return int(m.group(1)) * _UNITS[m.group(2)]
+
+def _pattern(name: str) -> bytes:
+    # One pseudo-random block per name, repeated; distinct names never dedupe to the same content
+    seed = hashlib.sha256(name.encode()).digest()
+    return (seed * (BLOCK // len(seed) + 1))[:BLOCK]
+
+def body_bytes(name: str, start: int, end: int) -> bytes:
+    """Bytes start..end (inclusive) of the generated file `name`."""
+    pat = _pattern(name)
+    out, pos = bytearray(), start
+    while pos <= end:
+        off = pos % BLOCK
+        n = min(BLOCK - off, end - pos + 1)
+        out += pat[off:off+n]
+        pos += n
+    return bytes(out)
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StandInServer"
+
+    def setup(self) -> None:
+        super().setup()
+        # Headers and a small body go out as separate writes; without this, Nagle plus
+        # delayed ACKs add ~40 ms to every small response and the benchmark measures that
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path, _, query = self.path.partition('?')
+        parts = path.strip('/').split('/', 2)
+        if len(parts) != 3 or parts[0] not in ("file", "norange", "slow", "flaky"):
+            self.send_error(404); return
+        kind, size_text, name = parts
+        try:
+            size = parse_size(size_text)
+        except ValueError:
+            self.send_error(400); return
+        self.server.count(kind)
+
+        rate = None
+        if kind == "slow":
+            m = re.search(r"(?:^|&)rate=(\d+)", query)
+            rate = int(m.group(1)) if m else 256*1024
+        cut = False
+        if kind == "flaky":
+            roll = self.server.roll()
+            if roll < 0.25:
+                self.send_error(503); return
+            cut = roll < 0.45
+
+        span: Optional[Tuple[int, int]] = None
+        m = _RANGE.match(self.headers.get('Range') or '')
+        if m and kind != "norange":
+            a = int(m.group(1)); b = min(int(m.group(2)) if m.group(2) else size - 1, size - 1)
+            if a >= size or a > b:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers(); return
+            span = (a, b)
+
+        etag = f'"{hashlib.sha1(f"{name}/{size}".encode()).hexdigest()[:16]}"'
+        if_range = self.headers.get('If-Range')
+        if span and if_range and if_range != etag:
+            span = None
+        start, end = span or (0, size - 1)
+        self.send_response(206 if span else 200)
+        if span:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        if kind != "norange":
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        stop = start + (end - start + 1) // 2 if cut else end + 1
+        chunk = 64*1024 if rate is None else max(1024, rate // 20)
+        t0, sent = time.monotonic(), 0
+        try:
+            pos = start
+            while pos < stop:
+                n = min(chunk, stop - pos)
+                self.wfile.write(body_bytes(name, pos, pos + n - 1))
+                pos += n; sent += n
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        if cut:
+            self.close_connection = True
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """Threaded stand-in on 127.0.0.1; `port=0` picks a free port."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, seed: int = 1):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients dropping connections (cancel, aborted segments) is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def url(self, kind: str, size: int, name: str, **query) -> str:
+        q = '&'.join(f"{k}={v}" for k, v in query.items())
+        return f"http://127.0.0.1:{self.server_address[1]}/{kind}/{size}/{name}" + (f"?{q}" if q else "")
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="bench-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+if __name__ == "__main__":
+    srv = StandInServer(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"serving on http://127.0.0.1:{srv.server_address[1]}/", file=sys.stderr)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        srv.server_close()
@@ -0,0 +1,8 @@
+import os
+
+def data_dir(*parts: str) -> str:
+    """Per-user PyWeb state directory ($PYWEB_HOME or ~/.pyweb), created on demand."""
+    root = os.environ.get("PYWEB_HOME") or os.path.join(os.path.expanduser("~"), ".pyweb")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,52 @@
+import json, os, sys, time
+from typing import List, Optional, Tuple
+
+class StartupTimer:
+    """Cold-start milestones, measured from process start (or from when this module was imported).
+
+    Enabled by `pyweb --timing[=FILE]` or PYWEB_TIMING=1|FILE; reports once on stderr,
+    and as one JSON line appended to FILE when given.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = self._process_start()
+        self.marks: List[Tuple[str, float]] = []
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._reported = False
+
+    @staticmethod
+    def _process_start() -> float:
+        try:
+            with open("/proc/self/stat") as f:
+                ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+            return time.perf_counter() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+        except (OSError, ValueError, IndexError, AttributeError):
+            return time.perf_counter()
+
+    def enable(self, path: Optional[str] = None) -> None:
+        self.enabled, self.path = True, path or None
+
+    def mark(self, name: str) -> None:
+        if self.enabled and name not in dict(self.marks):
+            self.marks.append((name, time.perf_counter() - self.t0))
+
+    def report(self) -> dict:
+        return {name: round(t * 1000, 1) for name, t in self.marks}
+
+    def finish(self) -> None:
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        ms = self.report()
+        print("pyweb startup: " + ", ".join(f"{k} {v:.0f} ms" for k, v in ms.items()), file=sys.stderr)
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(dict(ms, at=time.time())) + "\n")
+            except OSError as e:
+                print(f"pyweb startup: cannot write {self.path}: {e}", file=sys.stderr)
+
+startup = StartupTimer()
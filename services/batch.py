@@ -0,0 +1,125 @@
+"""Headless batch downloads: python app.py batch [urls.txt|-] ... (or python -m services.batch).
+
+Input lines are plain URLs or JSON objects {"url": ..., "dest": ..., "priority": ...};
+blank lines and lines starting with # are skipped. One JSON line per finished
+item is written to stdout. Exit status: 0 all done, 1 some failed, 2 usage error,
+130 interrupted. Nothing here may import wx.
+"""
+import argparse, json, os, sys, threading
+from typing import IO, Iterator, List, Optional
+
+from services.download_index import DownloadIndex
+from services.downloader import Downloader, DownloadItem, REFETCH
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+TERMINAL = ("done", "error", "canceled")
+
+def read_requests(stream: IO[str]) -> Iterator[dict]:
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {n}: {e}") from None
+            if not isinstance(req, dict) or not isinstance(req.get('url'), str):
+                raise ValueError(f"line {n}: expected an object with a \"url\" string")
+            if not isinstance(req.get('priority', 0), int):
+                raise ValueError(f"line {n}: \"priority\" must be an integer")
+            yield req
+        else:
+            yield {'url': line}
+
+def parse_rate(text: str) -> int:
+    """Bytes/second from e.g. '500K' or '2M' (binary units); 0 means unlimited."""
+    units = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3}
+    t = text.strip().upper().rstrip('B')
+    try:
+        return int(float(t[:-1] if t[-1:] in units else t) * units[t[-1:] if t[-1:] in units else ''])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate {text!r}") from None
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="pyweb batch", description="Download URL lists without the GUI.")
+    p.add_argument("inputs", nargs="*", default=["-"], help="URL list files, '-' for stdin (default)")
+    p.add_argument("-o", "--dest-dir", default=os.path.join(os.getcwd(), "downloads"))
+    p.add_argument("-j", "--jobs", type=int, default=6, help="concurrent downloads")
+    p.add_argument("--per-host", type=int, default=2, help="concurrent downloads per host")
+    p.add_argument("--segments", type=int, default=4, help="parallel ranges for large files (1 disables)")
+    p.add_argument("--index", help="download index database, enables dedup and conditional re-fetch")
+    p.add_argument("--refetch", choices=REFETCH, default="revalidate")
+    p.add_argument("--limit-rate", type=parse_rate, default=0, metavar="RATE",
+                   help="total bandwidth cap, e.g. 500K or 2M per second (default: none)")
+    p.add_argument("--retries", type=int, default=2, help="retries per item after transient errors")
+    p.add_argument("--metrics", help="write transfer metrics here when done (.prom/.txt: Prometheus text, else JSON)")
+    return p
+
+def _open_inputs(paths: List[str]) -> Iterator[IO[str]]:
+    for path in paths:
+        if path == "-":
+            yield sys.stdin
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield f
+
+def main(argv: Optional[List[str]] = None, out: IO[str] = sys.stdout) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        reqs = [r for stream in _open_inputs(args.inputs) for r in read_requests(stream)]
+    except (OSError, ValueError) as e:
+        print(f"pyweb batch: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not reqs:
+        print("pyweb batch: no URLs given", file=sys.stderr)
+        return EXIT_USAGE
+    # A URL listed twice is fetched once; the Downloader refuses two items writing one file
+    unique: dict = {}
+    for r in reqs:
+        unique.setdefault((r['url'], r.get('dest')), r)
+    reqs = list(unique.values())
+
+    lock, finished = threading.Lock(), threading.Event()
+    remaining = [len(reqs)]
+    failed = [0]
+
+    def on_update(it: DownloadItem):
+        if it.status not in TERMINAL:
+            return
+        with lock:
+            out.write(json.dumps({"url": it.url, "dest": it.dest, "status": it.status,
+                                  "size": it.size_bytes, "error": it.error, "bytes": it.bytes_done,
+                                  "rate": round(it.rate, 1), "ttfb": it.ttfb and round(it.ttfb, 4),
+                                  "retries": it.retries}) + "\n")
+            out.flush()
+            failed[0] += it.status != "done"
+            remaining[0] -= 1
+            if remaining[0] <= 0:
+                finished.set()
+
+    os.makedirs(args.dest_dir, exist_ok=True)
+    index = DownloadIndex(args.index) if args.index else None
+    dl = Downloader(on_update, max_workers=args.jobs, per_host=args.per_host, segments=args.segments,
+                    index=index, refetch=args.refetch, retries=args.retries,
+                    rate_limit=args.limit_rate)
+    try:
+        for r in reqs:
+            dest = r.get('dest') or dl.destination(r['url'], args.dest_dir)
+            dl.start(DownloadItem(url=r['url'], dest=dest, priority=r.get('priority', 0)))
+        while not finished.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        dl.shutdown()
+        return EXIT_INTERRUPTED
+    finally:
+        if args.metrics:
+            try:
+                dl.metrics.dump(args.metrics)
+            except OSError as e:
+                print(f"pyweb batch: {e}", file=sys.stderr)
+    dl.shutdown()
+    return EXIT_FAILED if failed[0] else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
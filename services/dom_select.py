@@ -1,9 +1,13 @@
 
+from services.perf import PERF_JS
+from services.webmsg import POST_JS
+
 HOVER_CSS = ".__pyweb_hover__ { outline: 2px solid #33aaff !important; outline-offset: -2px; }"
 
-# JS to enable hover-outline and click-to-pick; posts {type:'pyweb/elementPicked', info}
-HOVER_JS = (
+# Function expression: enable hover-outline and click-to-pick; posts {type:'pyweb/elementPicked', info}
+HOVER_PICK_JS = (
     "(() => {"
+    "  " + POST_JS +
     "  const styleId='__pyweb_hover_style__';"
     "  if (!document.getElementById(styleId)) {"
     "    const st = document.createElement('style'); st.id=styleId; st.textContent=%r; document.documentElement.appendChild(st);"
@@ -15,7 +19,7 @@ HOVER_JS = (
     "    e.preventDefault(); e.stopPropagation();"
     "    const el = e.target;"
     "    const info = { tag: el.tagName, id: el.id, classes: [...el.classList], src: el.src||null, outerHTML: el.outerHTML.slice(0,1000) };"
-    "    if (window.chrome && window.chrome.webview) { window.chrome.webview.postMessage({ type:'pyweb/elementPicked', info }); }"
+    "    post({ type:'pyweb/elementPicked', info });"
     "    remove();"
     "  };"
     "  function remove(){ document.removeEventListener('mouseover', over, true); document.removeEventListener('mouseout', out, true); document.removeEventListener('click', click, true); if(last) last.classList.remove('__pyweb_hover__'); }"
@@ -23,12 +27,20 @@ HOVER_JS = (
     "  document.addEventListener('mouseout', out, true);"
     "  document.addEventListener('click', click, true);"
     "  return true;"
-    "})();"
+    "})"
 ) % HOVER_CSS
 
-# Function expression: pass an element; returns a unique list of absolute URLs for sibling-scope images.
-SIBLING_IMAGES_JS = (
+# Function expression: pass an element; streams absolute image URLs from its repeated sibling scope.
+# Visibility comes from an IntersectionObserver (no forced layout per element); URLs prefer the
+# largest srcset candidate, then lazy-load attributes, then currentSrc/src. Results are posted as
+# {type:'pyweb/imageCandidates', urls, seq, done} batches of at most IMAGE_BATCH urls; `done` marks
+# the end of the initial pass, and images inserted later (infinite scroll) keep streaming until
+# window.__pywebImageStream.stop() or the next scan.
+IMAGE_BATCH = 200
+IMAGE_STREAM_JS = (
     "(el => {"
+    "  if (window.__pywebImageStream) window.__pywebImageStream.stop();"
+    "  " + POST_JS +
     "  function repeatedScope(n){"
     "    let p = n && n.parentElement, chosen = null;"
     "    while (p) {"
@@ -38,12 +50,128 @@ SIBLING_IMAGES_JS = (
     "    }"
     "    return chosen || document.body;"
     "  }"
+    "  const LAZY = ['data-src','data-lazy-src','data-original','data-url'];"
+    "  const SEL = 'img,picture source,[data-src],[data-srcset],[data-lazy-src],[data-original]';"
+    "  const abs = u => { try { return new URL(u, location.href).href } catch (e) { return null } };"
+    "  function bestOf(srcset){"
+    "    let best = null, score = -1;"
+    "    for (const part of (srcset||'').split(/,\\s+/)) {"
+    "      const [u, d] = part.trim().split(/\\s+/);"
+    "      if (!u) continue;"
+    "      const v = d ? parseFloat(d) * (d.endsWith('x') ? 1000 : 1) : 1;"
+    "      if (v > score) { score = v; best = u; }"
+    "    }"
+    "    return best;"
+    "  }"
+    "  function urlOf(n){"
+    "    const set = n.getAttribute('data-srcset') || n.getAttribute('srcset');"
+    "    let u = set && bestOf(set);"
+    "    for (const a of LAZY) { if (!u) u = n.getAttribute(a); }"
+    "    if (!u && n.tagName === 'IMG') u = n.currentSrc || n.src;"
+    "    return u && !u.startsWith('data:') ? abs(u) : null;"
+    "  }"
     "  const scope = repeatedScope(el || document.querySelector('img'));"
-    "  const urls = Array.from(scope.querySelectorAll('img'))"
-    "    .filter(i => i.offsetParent !== null) /* visible only */"
-    "    .map(i => i.currentSrc || i.src)"
-    "    .filter(Boolean)"
-    "    .map(u => { try { return new URL(u, location.href).href } catch (e) { return u } });"
-    "  return Array.from(new Set(urls));"
+    "  const seen = new Set(), observed = new WeakSet();"
+    "  let queue = [], seq = 0, initial = 0, reported = 0, done = false, timer = 0;"
+    "  function flush(){"
+    "    timer = 0;"
+    "    while (queue.length || (!done && reported >= initial)) {"
+    "      const urls = queue.splice(0, %d);"
+    "      if (!done && reported >= initial && !queue.length) done = true;"
+    "      post({ type:'pyweb/imageCandidates', urls, seq: seq++, done });"
+    "      if (!queue.length) break;"
+    "    }"
+    "  }"
+    "  const schedule = () => { if (queue.length >= %d) flush(); else if (!timer) timer = setTimeout(flush, 250); };"
+    "  const io = new IntersectionObserver(entries => {"
+    "    for (const e of entries) {"
+    "      const n = e.target; io.unobserve(n);"
+    "      if (!done) reported++;"
+    "      /* picture sources have no box: judge them by their <img> */"
+    "      const shown = e.isIntersecting || (n.tagName === 'SOURCE' && n.parentElement && n.parentElement.querySelector('img'));"
+    "      const u = shown && urlOf(n);"
+    "      if (u && !seen.has(u)) { seen.add(u); queue.push(u); }"
+    "    }"
+    "    schedule();"
+    "  }, { rootMargin: '100000px' });"
+    "  function watch(nodes){"
+    "    /* observe in slices so a huge gallery never blocks the page in one long task */"
+    "    let i = 0;"
+    "    (function slice(){"
+    "      const end = Math.min(nodes.length, i + 500);"
+    "      for (; i < end; i++) { const n = nodes[i]; if (!observed.has(n)) { observed.add(n); io.observe(n); } }"
+    "      if (i < nodes.length) setTimeout(slice, 0);"
+    "    })();"
+    "  }"
+    "  const initialNodes = Array.from(scope.querySelectorAll(SEL));"
+    "  initial = initialNodes.length;"
+    "  watch(initialNodes);"
+    "  if (!initial) flush();"
+    "  const mo = new MutationObserver(muts => {"
+    "    const fresh = [];"
+    "    for (const m of muts) {"
+    "      if (m.type === 'attributes') { observed.delete(m.target); fresh.push(m.target); continue; }"
+    "      for (const n of m.addedNodes) {"
+    "        if (n.nodeType !== 1) continue;"
+    "        if (n.matches(SEL)) fresh.push(n);"
+    "        fresh.push(...n.querySelectorAll(SEL));"
+    "      }"
+    "    }"
+    "    if (fresh.length) watch(fresh);"
+    "  });"
+    "  mo.observe(scope, { childList: true, subtree: true, attributes: true, attributeFilter: ['src','srcset','data-src','data-srcset'] });"
+    "  window.__pywebImageStream = { stop(){ mo.disconnect(); io.disconnect(); if (timer) clearTimeout(timer); window.__pywebImageStream = null; } };"
+    "  return true;"
     "})"
+) % (IMAGE_BATCH, IMAGE_BATCH)
+
+# Function expression: post the page's favicon URL, /favicon.ico when no link tag names one
+FAVICON_JS = (
+    "(() => {"
+    "  " + POST_JS +
+    "  const el = document.querySelector('link[rel~=\"icon\"]')"
+    "    || document.querySelector('link[rel=\"shortcut icon\"]')"
+    "    || document.querySelector('link[rel=\"apple-touch-icon\"]');"
+    "  let href = '';"
+    "  try { href = new URL(el ? el.href : '/favicon.ico', location.href).href; } catch (e) { href = el ? el.href : '/favicon.ico'; }"
+    "  post({ type:'pyweb/favicon', href });"
+    "  return true;"
+    "})"
+)
+
+# Installed once per WebView at document start (or run after each load where user scripts are
+# unsupported): defines window.__pyweb so the host only sends short calls such as
+# __pyweb.pick(), __pyweb.scanImages({id, classes}) or __pyweb.profile(true). Top-level documents only.
+PAGE_API_JS = (
+    "(() => {"
+    "  if (window.__pyweb || window.top !== window) return true;"
+    "  const pick = " + HOVER_PICK_JS + ";"
+    "  const stream = " + IMAGE_STREAM_JS + ";"
+    "  const favicon = " + FAVICON_JS + ";"
+    "  const profile = " + PERF_JS + ";"
+    "  function target(spec){"
+    "    spec = spec || {};"
+    "    let el = null;"
+    "    try {"
+    "      if (spec.id) el = document.getElementById(spec.id);"
+    "      else if (spec.classes && spec.classes.length) el = document.querySelector('.' + CSS.escape(spec.classes[0]));"
+    "    } catch (e) {}"
+    "    return el || document.querySelector('img');"
+    "  }"
+    "  window.__pyweb = {"
+    "    post: m => window.__pywebPost ? window.__pywebPost(m) : false,"
+    "    pick,"
+    "    scanImages: spec => stream(target(spec)),"
+    "    stopImages: () => { if (window.__pywebImageStream) window.__pywebImageStream.stop(); },"
+    "    favicon,"
+    "    profile,"
+    "  };"
+    "  if (document.readyState === 'complete') favicon();"
+    "  else window.addEventListener('load', favicon, { once: true });"
+    "  return true;"
+    "})();"
 )
+
+def page_script(bridge_js: str) -> str:
+    """Everything a tab installs: the message bridge first, then the window.__pyweb API."""
+    return bridge_js + PAGE_API_JS
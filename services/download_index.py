@@ -0,0 +1,74 @@
+import hashlib, sqlite3, threading, time
+from dataclasses import dataclass
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    fetched REAL
+);
+CREATE INDEX IF NOT EXISTS entries_sha ON entries(sha256, size);
+CREATE INDEX IF NOT EXISTS entries_path ON entries(path);
+"""
+
+@dataclass
+class IndexEntry:
+    url: str
+    path: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+def file_sha256(path: str, bufsize: int = 1024*1024) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(bufsize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class DownloadIndex:
+    """What has been downloaded: URL → validators, size, content hash and local path.
+
+    Shared by downloader workers; every call takes a lock and commits.
+    """
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def lookup(self, url: str) -> Optional[IndexEntry]:
+        with self._lock:
+            row = self._db.execute("SELECT url, path, etag, last_modified, size, sha256 FROM entries WHERE url=?",
+                                   (url,)).fetchone()
+        return IndexEntry(*row) if row else None
+
+    def by_hash(self, sha256: str, size: int, exclude: str = "") -> Optional[str]:
+        """A stored file with this content other than `exclude` (the file being checked)."""
+        with self._lock:
+            row = self._db.execute("SELECT path FROM entries WHERE sha256=? AND size=? AND path!=? LIMIT 1",
+                                   (sha256, size, exclude)).fetchone()
+        return row[0] if row else None
+
+    def owner(self, path: str) -> Optional[str]:
+        """URL whose download is stored at `path`, if any."""
+        with self._lock:
+            row = self._db.execute("SELECT url FROM entries WHERE path=? LIMIT 1", (path,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, e: IndexEntry) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO entries(url, path, etag, last_modified, size, sha256, fetched) "
+                             "VALUES (?,?,?,?,?,?,?)",
+                             (e.url, e.path, e.etag, e.last_modified, e.size, e.sha256, time.time()))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
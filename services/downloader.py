@@ -1,7 +1,24 @@
+import hashlib, heapq, http.client, itertools, os, threading, time, urllib.error, urllib.parse
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Dict, List, Set, Tuple
 
-import threading, urllib.request
-from dataclasses import dataclass
-from typing import Optional, Callable
+from services import segments
+from services.download_index import DownloadIndex, IndexEntry, file_sha256
+from services.http_pool import HttpPool
+from services.metrics import TransferMetrics
+from services.segments import RangeInfo, Segment, SegmentPlan
+
+_ids = itertools.count(1)
+
+CHUNK = 64*1024               # first read size; later reads adapt between CHUNK_MIN and CHUNK_MAX
+CHUNK_MIN, CHUNK_MAX = 16*1024, 1024*1024
+READ_TARGET = 0.05             # seconds one read should take
+SEGMENT_MIN = 1024*1024        # never split below 1 MiB per range
+SEGMENT_THRESHOLD = 8*1024*1024
+PART_SAVE_INTERVAL = 1.0       # seconds between sidecar checkpoints
+REFETCH = ("revalidate", "skip", "always")
+RETRY_BACKOFF = 0.5            # seconds before the first retry, doubled for each one after
 
 @dataclass
 class DownloadItem:
@@ -9,36 +26,627 @@ class DownloadItem:
     dest: str
     progress: int = 0
     size_bytes: Optional[int] = None
-    status: str = "queued"   # queued|downloading|done|error|canceled
+    status: str = "queued"   # queued|downloading|paused|done|error|canceled
     error: Optional[str] = None
+    priority: int = 0        # lower runs first
+    bytes_done: int = 0
+    rate: float = 0.0        # bytes/s: recent while downloading, average once finished
+    ttfb: Optional[float] = None
+    retries: int = 0
+    limit: Optional[int] = None   # bytes/s cap for this item, None for no cap
+    id: int = field(default_factory=lambda: next(_ids))
+
+    @property
+    def host(self) -> str:
+        return urllib.parse.urlsplit(self.url).netloc.lower()
 
 ProgressCb = Callable[[DownloadItem], None]
 
+class Canceled(Exception):
+    pass
+
+class ChunkSizer:
+    """Read size that follows throughput: doubled while full reads finish well under
+    READ_TARGET, halved when one takes much longer (slow links still see cancel promptly)."""
+    __slots__ = ("size",)
+
+    def __init__(self):
+        self.size = CHUNK
+
+    def observe(self, n: int, seconds: float) -> None:
+        if n >= self.size and seconds < READ_TARGET / 2:
+            self.size = min(CHUNK_MAX, self.size * 2)
+        elif seconds > READ_TARGET * 2:
+            self.size = max(CHUNK_MIN, self.size // 2)
+
+def preallocate(f, size: int) -> None:
+    """Reserve `size` bytes for the open file `f` up front (sparse truncate where fallocate is missing)."""
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except (AttributeError, OSError):
+        f.truncate(size)
+
+def _write_all(f, data: memoryview) -> None:
+    # Unbuffered files may write less than asked
+    while data:
+        data = data[f.write(data):]
+
+class TokenBucket:
+    """Bandwidth cap shared by every thread that consumes from it.
+
+    Consumers take tokens after each read and, when that leaves the bucket in
+    debt, sleep until it is repaid; the sleep is sliced so `set_rate` and
+    cancellation take effect within a tenth of a second.
+    """
+
+    def __init__(self, rate: Optional[int] = None, burst: float = 0.25):
+        self._lock = threading.Lock()
+        self.burst = burst
+        self.rate: Optional[int] = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self._t = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: Optional[int]) -> None:
+        """Bytes/second, or None / 0 for unlimited. Running consumers pick it up at once."""
+        with self._lock:
+            self._refill()
+            self.rate = rate if rate and rate > 0 else None
+            self.capacity = max(CHUNK, (self.rate or 0) * self.burst)
+            self.tokens = min(self.tokens, self.capacity) if self.rate else 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    def consume(self, n: int, check: Optional[Callable[[], None]] = None) -> None:
+        with self._lock:
+            if not self.rate:
+                return
+            self._refill()
+            self.tokens -= n
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return
+                self._refill()
+                if self.tokens >= 0:
+                    return
+                wait = -self.tokens / self.rate
+            if check: check()
+            time.sleep(min(wait, 0.1))
+
 class Downloader:
-    def __init__(self, on_update: ProgressCb):
+    """Schedules DownloadItems onto a fixed pool of worker threads.
+
+    Pending items wait in a priority queue per host; hosts below `per_host`
+    active transfers are offered in a second queue ordered by their best
+    item, so taking the next item never rescans hosts that are full. At most
+    `max_active` transfers run at once (never more than `max_workers`).
+
+    Files of at least `segment_threshold` bytes from servers that accept
+    ranges are fetched as up to `segments` parallel byte ranges into a
+    preallocated file, with a `.part` sidecar so an interrupted item resumes
+    where it left off. Each extra range connection takes one of the host's
+    `per_host` slots, so an item only splits as far as its host has room.
+
+    All requests go through `pool`, so items from the same host reuse
+    keep-alive connections instead of paying a handshake per file.
+
+    With an `index`, a URL downloaded before is revalidated with
+    If-None-Match/If-Modified-Since (`refetch="revalidate"`), not requested at
+    all (`"skip"`), or fetched again (`"always"`). Finished files are hashed,
+    and content already stored under another name is hard-linked to it
+    instead of being kept twice.
+
+    `rate_limit` caps the combined bandwidth of every transfer and an item's
+    `limit` caps that item alone; both can be changed while transfers run.
+
+    Transient failures (connection errors, 5xx, 429) are retried up to
+    `retries` times with backoff; segmented items resume from their sidecar.
+    Timings, rates and retries are recorded in `metrics`.
+    """
+
+    def __init__(self, on_update: ProgressCb, max_workers: int = 6, max_active: Optional[int] = None, per_host: int = 2,
+                 segments: int = 4, segment_threshold: int = SEGMENT_THRESHOLD, pool: Optional[HttpPool] = None,
+                 index: Optional[DownloadIndex] = None, refetch: str = "revalidate",
+                 metrics: Optional[TransferMetrics] = None, retries: int = 2, rate_limit: Optional[int] = None):
+        if refetch not in REFETCH:
+            raise ValueError(f"refetch must be one of {REFETCH}")
         self.on_update = on_update
+        self.index = index
+        self.refetch = refetch
+        self.metrics = metrics or TransferMetrics()
+        self.retries = max(0, retries)
+        self.bucket = TokenBucket(rate_limit)
+        self._item_buckets: Dict[int, TokenBucket] = {}
+        self._local = threading.local()
+        self._reserved: Dict[str, str] = {}   # path → URL handed out by destination()
+        self._writing: Dict[str, int] = {}    # dest → id of the pending or running item that owns it
+        self._claims: Dict[int, str] = {}     # item id → the dest it claimed; item.dest may be repointed later
+        self.pool = pool or HttpPool(max_per_host=max(per_host, segments))
+        self.segments = max(1, segments)
+        self.segment_threshold = segment_threshold
+        self.max_workers = max(1, max_workers)
+        self.max_active = max(1, max_active or self.max_workers)
+        self.per_host = max(1, per_host)
+        self._cv = threading.Condition()
+        self._by_host: Dict[str, List[Tuple[int, int, DownloadItem]]] = {}   # host → its pending items
+        self._ready: List[Tuple[int, int, str]] = []   # (priority, seq) of a host's best item, for hosts with a free slot
+        self._offered: Dict[str, Tuple[int, int]] = {}  # host → its one live entry in _ready; any other is stale
+        self._seq = itertools.count()
+        self._pending: Dict[int, DownloadItem] = {}
+        self._running: Dict[int, DownloadItem] = {}
+        self._hosts: Counter = Counter()
+        self._cancel: Set[int] = set()
+        self._workers: List[threading.Thread] = []
+        self._closed = False
 
+    # ---- public API ----
     def start(self, item: DownloadItem):
-        if item.status == "downloading":
-            return
-        item.status = "downloading"
+        with self._cv:
+            if self._closed or item.id in self._pending or item.id in self._running:
+                return
+            dest = os.path.abspath(item.dest)
+            owner = self._writing.get(dest)
+            if owner is not None and owner != item.id:
+                # Same URL queued twice, or two requests naming one file: they would share the .part
+                # sidecar and temp file, and one would rename the other's bytes away
+                item.status = "error"; item.error = f"another download is already writing {item.dest}"
+            else:
+                self._writing[dest] = item.id; self._claims[item.id] = dest
+                item.status = "queued"; item.error = None
+                self._cancel.discard(item.id)
+                self._pending[item.id] = item
+                self._push(item)
+                self._spawn_worker()
+                self._cv.notify()
         self.on_update(item)
-        threading.Thread(target=self._worker, args=(item,), daemon=True).start()
 
-    def _worker(self, item: DownloadItem):
+    def destination(self, url: str, dest_dir: str) -> str:
+        """Local path for `url` in `dest_dir`: where it was stored before, else a name no other URL uses."""
+        entry = self.index.lookup(url) if self.index else None
+        if entry and os.path.dirname(entry.path) == os.path.abspath(dest_dir):
+            return entry.path
+        name = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(url).path)) or 'download.bin'
+        stem, ext = os.path.splitext(name)
+        with self._cv:
+            for n in itertools.count():
+                path = os.path.abspath(os.path.join(dest_dir, f"{stem} ({n}){ext}" if n else name))
+                owner = self._reserved.get(path)
+                if owner is None and os.path.exists(path):
+                    owner = (self.index.owner(path) if self.index else None) or ''
+                if owner is None or owner == url:
+                    self._reserved[path] = url
+                    return path
+
+    def reserve(self, url: str, path: str) -> None:
+        """Hold `path` for `url`, as if `destination` had handed it out (items restored from a journal)."""
+        with self._cv:
+            self._reserved[os.path.abspath(path)] = url
+
+    def pause(self, item: DownloadItem) -> bool:
+        """Hold a queued item back; `start` (or `resume`) puts it back in line."""
+        with self._cv:
+            if self._pending.pop(item.id, None) is None:
+                return False
+            self._release(item)
+            item.status = "paused"
+        self.on_update(item)
+        return True
+
+    def resume(self, item: DownloadItem):
+        if item.status == "paused":
+            self.start(item)
+
+    def cancel(self, item: DownloadItem) -> bool:
+        """Cancel a queued, paused or running item. Running items stop at their next chunk."""
+        with self._cv:
+            if item.id in self._running:
+                self._cancel.add(item.id)
+                return True
+            if item.status not in ("queued", "paused"):
+                return False
+            self._pending.pop(item.id, None)
+            self._release(item, ended=True)
+            item.status = "canceled"
+        self.on_update(item)
+        return True
+
+    def set_limits(self, max_active: Optional[int] = None, per_host: Optional[int] = None):
+        with self._cv:
+            if max_active: self.max_active = max(1, min(max_active, self.max_workers))
+            if per_host: self.per_host = max(1, per_host)
+            for host in list(self._by_host):
+                self._offer(host)
+            self._cv.notify_all()
+
+    def set_rate_limit(self, bps: Optional[int]):
+        """Global cap in bytes/second (None or 0 lifts it), applied to running transfers too."""
+        self.bucket.set_rate(bps)
+
+    def set_item_limit(self, item: DownloadItem, bps: Optional[int]):
+        item.limit = bps if bps and bps > 0 else None
+        with self._cv:
+            bucket = self._item_buckets.get(item.id)
+        if bucket is not None:
+            bucket.set_rate(item.limit)
+
+    def set_priority(self, item: DownloadItem, priority: int):
+        """Move a queued item in line; lower runs first. Running items are unaffected."""
+        with self._cv:
+            if item.priority == priority:
+                return
+            item.priority = priority
+            if self._pending.get(item.id) is item:
+                self._push(item)
+                self._cv.notify()
+
+    def shutdown(self):
+        with self._cv:
+            self._closed = True
+            self._cancel.update(self._running)
+            self._pending.clear(); self._by_host.clear(); self._ready.clear(); self._offered.clear()
+            self._writing = {d: i for d, i in self._writing.items() if i in self._running}
+            self._claims = {i: d for i, d in self._claims.items() if i in self._running}
+            self._cv.notify_all()
+        self.pool.close()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._running)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # ---- scheduling ----
+    def _release(self, item: DownloadItem, ended: bool = False):
+        """Drop the item's claim on the dest it started with; once it has `ended`, free that name for destination() too."""
+        dest = self._claims.pop(item.id, None) or os.path.abspath(item.dest)   # paused: claim already dropped, dest untouched
+        if self._writing.get(dest) == item.id:
+            del self._writing[dest]
+        if ended and self._reserved.get(dest) == item.url:
+            del self._reserved[dest]
+
+    def _spawn_worker(self):
+        # Grow the pool lazily, one thread per queued item, up to max_workers.
+        if len(self._workers) < self.max_workers and len(self._workers) < len(self._running) + len(self._pending):
+            t = threading.Thread(target=self._worker_loop, name=f"pyweb-dl-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _push(self, item: DownloadItem):
+        """Queue `item` on its host; caller holds the lock."""
+        heapq.heappush(self._by_host.setdefault(item.host, []), (item.priority, next(self._seq), item))
+        self._offer(item.host)
+
+    def _head(self, host: str) -> Optional[Tuple[int, int, DownloadItem]]:
+        """The host's best pending entry, dropping stale ones (paused, canceled, re-queued, re-prioritized)."""
+        heap = self._by_host.get(host)
+        while heap:
+            entry = heap[0]
+            it = entry[2]
+            if self._pending.get(it.id) is it and entry[0] == it.priority:
+                return entry
+            heapq.heappop(heap)
+        self._by_host.pop(host, None)
+        self._offered.pop(host, None)
+        return None
+
+    def _offer(self, host: str):
+        # A host is in the ready queue once, under its best item; a better item replaces the offer
+        # and the outdated entry is discarded when _take reaches it
+        head = self._head(host)
+        if head is not None and self._hosts[host] < self.per_host and self._offered.get(host) != head[:2]:
+            self._offered[host] = head[:2]
+            heapq.heappush(self._ready, (head[0], head[1], host))
+
+    def _take(self) -> Optional[DownloadItem]:
+        """Pop the best runnable item; caller holds the lock."""
+        if len(self._running) >= self.max_active:
+            return None
+        while self._ready:
+            prio, seq, host = heapq.heappop(self._ready)
+            if self._offered.get(host) != (prio, seq):
+                continue   # superseded by a newer offer
+            del self._offered[host]
+            if self._hosts[host] >= self.per_host:
+                continue   # offered again when one of its transfers ends
+            head = self._head(host)
+            if head is None:
+                continue
+            if head[:2] != (prio, seq):   # that item left the queue: offer the host under its new best
+                self._offer(host)
+                continue
+            heapq.heappop(self._by_host[host])
+            found = head[2]
+            del self._pending[found.id]
+            self._running[found.id] = found
+            self._hosts[host] += 1
+            self._item_buckets[found.id] = TokenBucket(found.limit)
+            self._offer(host)
+            return found
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cv:
+                item = self._take()
+                while item is None:
+                    if self._closed:
+                        return
+                    self._cv.wait()
+                    item = self._take()
+            try:
+                self._run(item)
+            finally:
+                with self._cv:
+                    self._running.pop(item.id, None)
+                    self._release(item, ended=True)
+                    self._item_buckets.pop(item.id, None)
+                    self._cancel.discard(item.id)
+                    self._hosts[item.host] -= 1
+                    if self._hosts[item.host] <= 0: del self._hosts[item.host]
+                    self._offer(item.host)
+                    self._cv.notify_all()
+
+    def _buffer(self) -> memoryview:
+        """This thread's read buffer, allocated once and reused for every chunk."""
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = self._local.buf = memoryview(bytearray(CHUNK_MAX))
+        return buf
+
+    def _check_cancel(self, item: DownloadItem):
+        if item.id in self._cancel:
+            raise Canceled()
+
+    def _read_size(self, item: DownloadItem, sizer: ChunkSizer) -> int:
+        # Under a cap, one read is at most one burst: reads the sizer grew on a fast link would
+        # otherwise arrive as a large jump followed by a long sleep
+        size = sizer.size
+        for bucket in (self._item_buckets.get(item.id), self.bucket):
+            if bucket is not None and bucket.rate:
+                size = min(size, max(CHUNK_MIN, int(bucket.rate * bucket.burst)))
+        return size
+
+    def _throttle(self, item: DownloadItem, n: int):
+        check = lambda: self._check_cancel(item)
+        bucket = self._item_buckets.get(item.id)
+        if bucket is not None:
+            bucket.consume(n, check)
+        self.bucket.consume(n, check)
+
+    # ---- transfer ----
+    def _run(self, item: DownloadItem):
+        item.status = "downloading"
+        self.metrics.begin(item)
+        self.on_update(item)
         try:
-            with urllib.request.urlopen(item.url) as resp:
-                total = getattr(resp, 'length', None)
-                item.size_bytes = total
-                with open(item.dest, 'wb') as f:
-                    read = 0
-                    while True:
-                        chunk = resp.read(64*1024)
-                        if not chunk: break
-                        f.write(chunk)
-                        read += len(chunk)
-                        item.progress = int(read*100/max(1, total)) if total else (item.progress+5) % 100
-                        self.on_update(item)
-            item.progress = 100; item.status = 'done'; self.on_update(item)
+            for attempt in itertools.count():
+                try:
+                    self._transfer(item)
+                    break
+                except Exception as e:
+                    if attempt >= self.retries or not self._transient(e):
+                        raise
+                    self.metrics.retry(item)
+                    self._backoff(item, RETRY_BACKOFF * 2**attempt)
+            item.progress = 100; item.status = 'done'
+        except Canceled:
+            item.status = 'canceled'
         except Exception as e:
-            item.status = 'error'; item.error = str(e); self.on_update(item)
+            item.status = 'error'; item.error = str(e)
+        self.metrics.finish(item)
+        self.on_update(item)
+
+    @staticmethod
+    def _transient(e: Exception) -> bool:
+        if isinstance(e, urllib.error.HTTPError):
+            return e.code >= 500 or e.code == 429
+        return isinstance(e, (OSError, http.client.HTTPException)) and not isinstance(e, (FileNotFoundError, PermissionError, IsADirectoryError))
+
+    def _backoff(self, item: DownloadItem, delay: float):
+        end = time.monotonic() + delay
+        while time.monotonic() < end:
+            self._check_cancel(item)
+            time.sleep(min(0.1, max(0.0, end - time.monotonic())))
+        self._check_cancel(item)
+
+    def _request(self, item: DownloadItem, headers: Dict[str, str]):
+        t = time.monotonic()
+        try:
+            resp = self.pool.request(item.url, headers=headers)
+        except urllib.error.HTTPError:
+            self.metrics.response(item, time.monotonic() - t)
+            raise
+        self.metrics.response(item, time.monotonic() - t)
+        return resp
+
+    def _transfer(self, item: DownloadItem):
+        entry = self.index.lookup(item.url) if self.index else None
+        if entry and not os.path.exists(entry.path):
+            entry = None
+        if entry and self.refetch == "skip":
+            return self._reuse(item, entry)
+        if self.segments > 1:
+            prev = segments.load_part(item.dest)
+            if prev:
+                info = segments.probe(self.pool, item.url)
+                if info.ranges and prev.matches(item.url, info):
+                    extra = self._borrow_slots(item.host, sum(not seg.complete for seg in prev.segments) - 1)
+                    self._transfer_segmented(item, prev, fresh=False, extra=extra)
+                    return self._store(item, None, prev.etag, info.last_modified)
+                segments.drop_part(item.dest)
+        headers = {}
+        if entry and self.refetch == "revalidate":
+            if entry.etag: headers['If-None-Match'] = entry.etag
+            if entry.last_modified: headers['If-Modified-Since'] = entry.last_modified
+        with self._request(item, headers) as resp:
+            if resp.status == 304:
+                return self._reuse(item, entry)
+            total = resp.length
+            etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+            info = RangeInfo(total, True, etag, last_modified)
+            p = segments.plan(item.url, info, self.segments, SEGMENT_MIN) if self._segmentable(resp, total) else None
+            extra = self._borrow_slots(item.host, len(p.segments) - 1) if p else 0
+            if not extra:
+                digest = self._stream(item, resp, total)
+                return self._store(item, digest, etag, last_modified)
+            if extra < len(p.segments) - 1:
+                p = segments.plan(item.url, info, 1 + extra, SEGMENT_MIN)
+        self._transfer_segmented(item, p, fresh=True, extra=extra)
+        self._store(item, None, etag, last_modified)
+
+    def _reuse(self, item: DownloadItem, entry: IndexEntry):
+        # Unchanged on the server (or skipped): point the item at the stored copy
+        item.dest, item.size_bytes = entry.path, entry.size
+
+    def _store(self, item: DownloadItem, digest: Optional[str], etag: Optional[str], last_modified: Optional[str]):
+        if not self.index:
+            return
+        size = os.path.getsize(item.dest)
+        digest = digest or file_sha256(item.dest)
+        same = self.index.by_hash(digest, size, exclude=item.dest)
+        if same and os.path.exists(same):
+            os.remove(item.dest)
+            try:
+                os.link(same, item.dest)
+            except OSError:
+                item.dest = same
+        self.index.record(IndexEntry(item.url, item.dest, etag, last_modified, size, digest))
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _segmentable(self, resp, total: Optional[int]) -> bool:
+        return (self.segments > 1 and bool(total) and total >= self.segment_threshold
+                and (resp.headers.get('Accept-Ranges') or '').lower() == 'bytes')
+
+    def _stream(self, item: DownloadItem, resp, total: Optional[int]) -> str:
+        item.size_bytes = total
+        item.progress = 0
+        self.metrics.restart(item)
+        digest, buf, sizer = hashlib.sha256(), self._buffer(), ChunkSizer()
+        tmp = segments.temp_path(item.dest)
+        try:
+            with open(tmp, 'wb') as f:
+                if total:
+                    preallocate(f, total)
+                while True:
+                    self._check_cancel(item)
+                    t = time.monotonic()
+                    n = resp.readinto(buf[:self._read_size(item, sizer)])
+                    if not n: break
+                    sizer.observe(n, time.monotonic() - t)
+                    chunk = buf[:n]
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self.metrics.progress(item, n)
+                    self._throttle(item, n)
+                    if total:
+                        item.progress = int(item.bytes_done*100/max(1, total))
+                    self.on_update(item)
+                if total and item.bytes_done < total:
+                    raise OSError(f"connection closed at byte {item.bytes_done} of {total}")
+            # Renaming over the final name also never writes through a hard link to another download
+            os.replace(tmp, item.dest)
+        except BaseException:
+            self._unlink(tmp)
+            raise
+        return digest.hexdigest()
+
+    def _borrow_slots(self, host: str, want: int) -> int:
+        """Take up to `want` of the host's free slots for extra range connections."""
+        with self._cv:
+            n = max(0, min(want, self.per_host - self._hosts[host]))
+            self._hosts[host] += n
+            return n
+
+    def _return_slots(self, host: str, n: int):
+        if n:
+            with self._cv:
+                self._hosts[host] -= n
+                self._offer(host)
+                self._cv.notify_all()
+
+    def _transfer_segmented(self, item: DownloadItem, p: SegmentPlan, fresh: bool, extra: int):
+        """Fetch the plan's incomplete ranges over 1 + `extra` connections; the `extra` host slots are returned after."""
+        try:
+            self._fetch_segments(item, p, fresh, 1 + extra)
+        finally:
+            self._return_slots(item.host, extra)
+
+    def _fetch_segments(self, item: DownloadItem, p: SegmentPlan, fresh: bool, conns: int):
+        item.size_bytes = p.size
+        tmp = segments.temp_path(item.dest)
+        if fresh or not os.path.exists(tmp) or os.path.getsize(tmp) != p.size:
+            for seg in p.segments: seg.done = 0
+            with open(tmp, 'wb') as f:
+                preallocate(f, p.size)
+        segments.save_part(item.dest, p)
+        self.metrics.restart(item, p.done_bytes)
+        lock, abort, errors = threading.Lock(), threading.Event(), []
+        last_save = [time.monotonic()]
+
+        def on_chunk(seg: Segment, n: int):
+            self.metrics.progress(item, n)
+            with lock:
+                seg.done += n
+                item.progress = int(p.done_bytes*100/max(1, p.size))
+                if time.monotonic() - last_save[0] >= PART_SAVE_INTERVAL:
+                    segments.save_part(item.dest, p); last_save[0] = time.monotonic()
+            self.on_update(item)
+
+        todo = [seg for seg in p.segments if not seg.complete]
+
+        def run():
+            while not abort.is_set():
+                with lock:
+                    if not todo: return
+                    seg = todo.pop(0)
+                try:
+                    self._fetch_segment(item, p, seg, on_chunk, abort)
+                except BaseException as e:
+                    errors.append(e); abort.set()
+
+        threads = [threading.Thread(target=run, name=f"pyweb-seg-{item.id}", daemon=True)
+                   for _ in range(min(conns, len(todo)))]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        if errors or not p.complete:
+            with lock: segments.save_part(item.dest, p)
+            raise next((e for e in errors if isinstance(e, Canceled)), errors[0] if errors else OSError("incomplete segmented download"))
+        os.replace(tmp, item.dest)
+        segments.drop_part(item.dest)
+
+    def _fetch_segment(self, item: DownloadItem, p: SegmentPlan, seg: Segment, on_chunk, abort: threading.Event):
+        headers = {'Range': f'bytes={seg.offset}-{seg.end}', 'Accept-Encoding': 'identity'}
+        if p.etag: headers['If-Range'] = p.etag
+        with self._request(item, headers) as resp:
+            if resp.status != 206:
+                raise OSError(f"server ignored range request (HTTP {resp.status})")
+            buf, sizer = self._buffer(), ChunkSizer()
+            # Unbuffered so the sidecar never records bytes still sitting in a userspace buffer
+            with open(segments.temp_path(item.dest), 'r+b', buffering=0) as f:
+                f.seek(seg.offset)
+                while not seg.complete:
+                    self._check_cancel(item)
+                    if abort.is_set(): return
+                    want = min(self._read_size(item, sizer), seg.end + 1 - seg.offset)
+                    t = time.monotonic()
+                    n = resp.readinto(buf[:want])
+                    if not n:
+                        raise OSError(f"connection closed at byte {seg.offset}")
+                    sizer.observe(n, time.monotonic() - t)
+                    _write_all(f, buf[:n])
+                    on_chunk(seg, n)
+                    self._throttle(item, n)
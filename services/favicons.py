@@ -0,0 +1,118 @@
+import hashlib, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from services.http_pool import HttpPool
+
+MAX_BYTES = 256*1024
+TTL = 7*24*3600
+
+ReadyCb = Callable[[str, Any, Any], None]   # (href, decoded or None, token)
+
+class FaviconCache:
+    """Fetches favicons on background threads with memory and disk caching.
+
+    `decode(bytes)` runs on the worker; its result is kept in an LRU of
+    `max_memory` entries and handed to `on_ready(href, result, token)` for
+    every `request` that asked for that href — also on the worker thread, so
+    GUI callers must marshal it back themselves. Concurrent requests for the
+    same href share one fetch. Raw bytes are kept under `cache_dir` for `ttl`
+    seconds; failures are remembered in memory only.
+    """
+
+    def __init__(self, cache_dir: str, decode: Callable[[bytes], Any], on_ready: ReadyCb,
+                 pool: Optional[HttpPool] = None, max_memory: int = 256, ttl: float = TTL, workers: int = 2):
+        self.cache_dir = cache_dir
+        self.decode = decode
+        self.on_ready = on_ready
+        self.pool = pool or HttpPool(max_per_host=2, timeout=15)
+        self.max_memory = max_memory
+        self.ttl = ttl
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()
+        self._waiters: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._exec = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyweb-favicon")
+        self._exec.submit(self.prune)
+
+    def request(self, href: str, token: Any = None) -> None:
+        with self._lock:
+            if href in self._mem:
+                self._mem.move_to_end(href)
+                result = self._mem[href]
+            elif href in self._waiters:
+                self._waiters[href].append(token)
+                return
+            else:
+                self._waiters[href] = [token]
+                self._exec.submit(self._load, href)
+                return
+        self.on_ready(href, result, token)
+
+    def prune(self) -> None:
+        """Delete on-disk entries older than `ttl`."""
+        cutoff = time.time() - self.ttl
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self._exec.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+
+    # ---- worker side ----
+    def _path(self, href: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(href.encode('utf-8')).hexdigest() + ".ico")
+
+    def _load(self, href: str) -> None:
+        result = None
+        try:
+            data = self._read_disk(href)
+            if data is None:
+                data = self._fetch(href)
+                self._write_disk(href, data)
+            result = self.decode(data) if data else None
+        except Exception:
+            result = None
+        with self._lock:
+            self._mem[href] = result
+            while len(self._mem) > self.max_memory:
+                self._mem.popitem(last=False)
+            tokens = self._waiters.pop(href, [])
+        for token in tokens:
+            self.on_ready(href, result, token)
+
+    def _read_disk(self, href: str) -> Optional[bytes]:
+        path = self._path(href)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, href: str, data: bytes) -> None:
+        path = self._path(href)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _fetch(self, href: str) -> bytes:
+        chunks, total = [], 0
+        with self.pool.request(href) as resp:
+            while total <= MAX_BYTES:
+                chunk = resp.read(64*1024)
+                if not chunk: break
+                chunks.append(chunk); total += len(chunk)
+        if total > MAX_BYTES:
+            raise ValueError("favicon too large")
+        return b''.join(chunks)
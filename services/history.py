@@ -0,0 +1,199 @@
+import math, queue, re, sqlite3, threading, time, urllib.parse
+from typing import List, Optional, Tuple
+
+RECENCY_DAYS_PER_DOUBLING = 7   # doubling an entry's visit count is worth this many days of recency
+SHORT_PREFIX = 2                # prefixes this short only match hosts; full URLs would scan too many rows
+WRITE_BATCH = 500
+TITLE_CANDIDATES = 200          # title-word hits ranked per keystroke; bounds cost for common words
+KEY_CANDIDATES = 500            # a prefix with at most this many URLs is ranked exactly from the key index
+SCORE_SCAN = 5_000              # ...a commoner one is looked for among this many best-scored URLs
+
+_SCHEME = re.compile(r"^[a-z][a-z0-9+.-]*://(www\.)?", re.I)
+_WORD = re.compile(r"\w+", re.U)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    key TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    visits INTEGER NOT NULL DEFAULT 0,
+    last_visit REAL NOT NULL,
+    score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_key_score ON urls(key, score);
+CREATE INDEX IF NOT EXISTS urls_score_key ON urls(score, key);
+CREATE INDEX IF NOT EXISTS urls_last_visit ON urls(last_visit);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    origin TEXT NOT NULL,
+    score REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS titles USING fts5(title, tokenize='unicode61', prefix='2 3')"
+
+def url_key(text: str) -> str:
+    """What the user would type for a URL: no scheme, no leading www., lowercase."""
+    return _SCHEME.sub('', text.strip()).lower()
+
+def frecency(visits: int, last_visit: float) -> float:
+    return last_visit / 86400 + RECENCY_DAYS_PER_DOUBLING * math.log2(1 + visits)
+
+class HistoryStore:
+    """Browsing history in SQLite (WAL) ranked by visit count and recency.
+
+    Writes are queued to a background thread and committed in batches;
+    reads (`suggest`, `recent`) run on the caller's connection. Typed text is
+    matched against a small per-host table first, then against URL prefixes,
+    then against title words in an FTS5 table when SQLite has it. A prefix
+    few URLs share is ranked from the (key, score) index; a common one (a
+    whole host's pages) is found by walking the (score, key) index from the
+    top, so neither reads more than a bounded number of index entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        db = self._connect()
+        db.executescript(SCHEMA)
+        try:
+            db.execute(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        db.commit()
+        self._db = db
+        self._writer = threading.Thread(target=self._write_loop, name="pyweb-history", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # ---- writes (async) ----
+    def visit(self, url: str, title: str = "") -> None:
+        if url and not url.startswith(("about:", "data:")):
+            self._queue.put(("visit", (url, title or "", time.time())))
+
+    def set_title(self, url: str, title: str) -> None:
+        if url and title:
+            self._queue.put(("title", (url, title)))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        done = threading.Event()
+        self._queue.put(("sync", (done,)))
+        done.wait(timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join(5.0)
+        self._db.close()
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        while True:
+            ops = [self._queue.get()]
+            while len(ops) < WRITE_BATCH:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in ops
+            try:
+                with db:
+                    for op in ops:
+                        if op and op[0] != "sync":
+                            getattr(self, "_apply_" + op[0])(db, *op[1])
+            except sqlite3.Error:
+                pass
+            for op in ops:
+                if op and op[0] == "sync":
+                    op[1][0].set()
+            if stop:
+                db.close()
+                return
+
+    def _apply_visit(self, db: sqlite3.Connection, url: str, title: str, when: float) -> None:
+        row = db.execute("SELECT id, visits, title FROM urls WHERE url=?", (url,)).fetchone()
+        key = url_key(url)
+        if row is None:
+            score = frecency(1, when)
+            cur = db.execute("INSERT INTO urls(url, key, title, visits, last_visit, score) VALUES (?,?,?,?,?,?)",
+                             (url, key, title, 1, when, score))
+            if self.fts:
+                db.execute("INSERT INTO titles(rowid, title) VALUES (?,?)", (cur.lastrowid, title))
+        else:
+            rid, visits, old_title = row
+            title = title if title and title != url else old_title
+            score = frecency(visits + 1, when)
+            db.execute("UPDATE urls SET visits=?, last_visit=?, score=?, title=? WHERE id=?",
+                       (visits + 1, when, score, title, rid))
+            if self.fts and title != old_title:
+                db.execute("UPDATE titles SET title=? WHERE rowid=?", (title, rid))
+        parts = urllib.parse.urlsplit(url)
+        if parts.netloc:
+            db.execute("INSERT INTO hosts(host, origin, score) VALUES (?,?,?) "
+                       "ON CONFLICT(host) DO UPDATE SET origin=excluded.origin, score=max(score, excluded.score)",
+                       (key.split('/', 1)[0], f"{parts.scheme}://{parts.netloc}/", score))
+
+    def _apply_title(self, db: sqlite3.Connection, url: str, title: str) -> None:
+        row = db.execute("SELECT id FROM urls WHERE url=?", (url,)).fetchone()
+        if row:
+            db.execute("UPDATE urls SET title=? WHERE id=?", (title, row[0]))
+            if self.fts:
+                db.execute("UPDATE titles SET title=? WHERE rowid=?", (title, row[0]))
+
+    # ---- reads ----
+    def recent(self, limit: int = 15) -> List[Tuple[str, str]]:
+        return self._db.execute("SELECT title, url FROM urls ORDER BY last_visit DESC LIMIT ?", (limit,)).fetchall()
+
+    def suggest(self, text: str, limit: int = 8) -> List[Tuple[str, str]]:
+        """(title, url) pairs: matching hosts, then URLs starting with `text`, then title-word matches."""
+        q = url_key(text)
+        if not q:
+            return []
+        rows: List[Tuple[str, str]] = []
+        deep = len(q) > SHORT_PREFIX or '/' in q
+        if '/' not in q:
+            rows = self._db.execute(
+                "SELECT host, origin FROM hosts WHERE host >= ? AND host < ? ORDER BY score DESC LIMIT ?",
+                (q, q + "\uffff", max(1, limit // 2) if deep else limit)).fetchall()
+        if deep and len(rows) < limit:
+            rows += self._by_ids(self._prefix_ids(q, limit), rows, limit)
+        if self.fts and deep and len(rows) < limit:
+            words = _WORD.findall(text)
+            if words:
+                # Earlier words are complete; only the one being typed needs a prefix match
+                match = " ".join('"%s"' % w.replace('"', '""') for w in words) + "*"
+                ids = [r[0] for r in self._db.execute(
+                    "SELECT u.id FROM (SELECT rowid FROM titles WHERE titles MATCH ? LIMIT ?) t "
+                    "JOIN urls u ON u.id = t.rowid ORDER BY u.score DESC LIMIT ?", (match, TITLE_CANDIDATES, limit))]
+                rows += self._by_ids(ids, rows, limit)
+        return rows
+
+    def _prefix_ids(self, q: str, limit: int) -> List[int]:
+        """Ids of the best-scored URLs whose key starts with `q`, best first."""
+        hits = self._db.execute(
+            "SELECT id, score FROM urls INDEXED BY urls_key_score WHERE key >= ? AND key < ? LIMIT ?",
+            (q, q + "\uffff", KEY_CANDIDATES + 1)).fetchall()
+        if len(hits) <= KEY_CANDIDATES:
+            return [rid for rid, _ in sorted(hits, key=lambda h: -h[1])[:limit]]
+        # Common prefix: its best URLs are almost always among the best overall
+        ids = [r[0] for r in self._db.execute(
+            "SELECT id FROM (SELECT id, key FROM urls INDEXED BY urls_score_key ORDER BY score DESC LIMIT ?) "
+            "WHERE key >= ? AND key < ? LIMIT ?", (SCORE_SCAN, q, q + "\uffff", limit))]
+        if len(ids) < limit:   # ...unless they are all old: fall back to the sample from the key index
+            ids += [rid for rid, _ in sorted(hits, key=lambda h: -h[1]) if rid not in ids][:limit - len(ids)]
+        return ids
+
+    def _by_ids(self, ids: List[int], have: List[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        if not ids:
+            return []
+        found = {rid: (title or url, url) for rid, title, url in self._db.execute(
+            f"SELECT id, title, url FROM urls WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        seen = {u for _, u in have}
+        out = [found[rid] for rid in ids if rid in found and found[rid][1] not in seen]
+        return out[:limit - len(have)]
@@ -0,0 +1,211 @@
+import base64, http.client, ssl, threading, time, urllib.error, urllib.parse, urllib.request, zlib
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+USER_AGENT = "PyWeb/1.0"
+REDIRECTS = (301, 302, 303, 307, 308)
+DRAIN_MAX = 64*1024    # finish reading small leftover bodies so the socket can be reused
+
+_Key = Tuple[str, str, int]
+_Route = Tuple[str, int, Dict[str, str]]   # proxy host, port, headers it needs
+# A reused keep-alive socket may have been closed by the server in the meantime
+_STALE = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+class Response:
+    """Body stream for one pooled request; decodes gzip/deflate transparently.
+
+    Closing it hands the connection back to the pool when the body was read
+    to the end, otherwise the socket is dropped.
+    """
+
+    def __init__(self, pool: "HttpPool", key: _Key, conn: http.client.HTTPConnection,
+                 resp: http.client.HTTPResponse, url: str):
+        self._pool, self._key, self._conn, self._resp = pool, key, conn, resp
+        self.url = url
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+        self.encoding = (resp.getheader('Content-Encoding') or 'identity').strip().lower()
+        self._z = None
+        if self.encoding == 'gzip':
+            self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == 'deflate':
+            self._z = zlib.decompressobj()
+        self._first = True
+        self._eof = False
+
+    @property
+    def length(self) -> Optional[int]:
+        """Decoded body length, when the server's Content-Length describes it."""
+        return None if self._z else self._resp.length
+
+    def read(self, n: int = -1) -> bytes:
+        """Up to `n` decoded bytes (b'' at end of body); the whole rest of the body when `n` is negative or None."""
+        if not self._z:
+            return self._resp.read() if n is None or n < 0 else self._resp.read(n)
+        if n is None or n < 0:
+            return b''.join(iter(lambda: self.read(64*1024), b''))
+        limit = n
+        out = b''
+        while not out and not self._eof:
+            data = self._z.unconsumed_tail or self._resp.read(64*1024)
+            if not data:
+                out = self._z.flush(); self._eof = True
+                break
+            out = self._decompress(data, limit)
+        return out
+
+    def readinto(self, b) -> int:
+        """Fill as much of the writable buffer `b` as one read allows; 0 at end of body."""
+        if not self._z:
+            return self._resp.readinto(b)
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def _decompress(self, data: bytes, limit: int) -> bytes:
+        try:
+            return self._z.decompress(data, limit)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            if not (self._first and self.encoding == 'deflate'):
+                raise
+            self._z = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._z.decompress(data, limit)
+        finally:
+            self._first = False
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        resp = self._resp
+        if not resp.isclosed() and resp.length is not None and resp.length <= DRAIN_MAX:
+            try:
+                resp.read()
+            except Exception:
+                pass
+        if resp.isclosed() and not resp.will_close:
+            self._pool._release(self._key, conn)
+        else:
+            resp.close(); conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class HttpPool:
+    """Keeps persistent HTTP(S) connections per (scheme, host, port) for reuse.
+
+    At most `max_per_host` idle sockets are kept per host and dropped after
+    `idle_timeout` seconds unused. Redirects are followed; 4xx/5xx raise
+    urllib.error.HTTPError like urlopen. Proxies come from the environment
+    (http_proxy, https_proxy, no_proxy) as with urlopen: plain HTTP is sent to
+    the proxy with an absolute URL, HTTPS is tunnelled through CONNECT.
+    """
+
+    def __init__(self, max_per_host: int = 6, idle_timeout: float = 30.0, timeout: float = 60.0, compress: bool = True):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+        self._idle: Dict[_Key, Deque[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+        self._proxies = urllib.request.getproxies()
+
+    def request(self, url: str, headers: Optional[Dict[str, str]] = None, method: str = 'GET',
+                max_redirects: int = 5) -> Response:
+        hdrs = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate' if self.compress else 'identity'}
+        hdrs.update(headers or {})
+        for _ in range(max_redirects + 1):
+            resp = self._send(url, method, hdrs)
+            location = resp.headers.get('Location')
+            if resp.status not in REDIRECTS or not location:
+                break
+            resp.close()
+            url = urllib.parse.urljoin(url, location)
+            if resp.status == 303:
+                method = 'GET'
+        else:
+            raise urllib.error.URLError(f"too many redirects: {url}")
+        if resp.status >= 400:
+            resp.close()
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        return resp
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    # ---- internals ----
+    def _send(self, url: str, method: str, headers: Dict[str, str]) -> Response:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise urllib.error.URLError(f"unsupported scheme: {scheme}")
+        key = (scheme, parts.hostname or '', parts.port or (443 if scheme == 'https' else 80))
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        route = self._route(scheme, key[1])
+        if route and scheme == 'http':
+            target = urllib.parse.urlunsplit(parts._replace(fragment=''))
+            headers = dict(headers, **route[2])
+        while True:
+            conn, reused = self._acquire(key, route)
+            try:
+                conn.request(method, target, headers=headers)
+                resp = conn.getresponse()
+            except _STALE:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            return Response(self, key, conn, resp, url)
+
+    def _route(self, scheme: str, host: str) -> Optional[_Route]:
+        proxy = self._proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        p = urllib.parse.urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+        auth = {}
+        if p.username:
+            cred = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+            auth['Proxy-Authorization'] = 'Basic ' + base64.b64encode(cred.encode()).decode('ascii')
+        return p.hostname or '', p.port or 80, auth
+
+    def _acquire(self, key: _Key, route: Optional[_Route] = None) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            conns = self._idle.get(key)
+            while conns:
+                conn, used = conns.pop()
+                if now - used <= self.idle_timeout and conn.sock is not None:
+                    return conn, True
+                conn.close()
+        scheme, host, port = key
+        if route:   # still pooled under the origin's key: a tunnel only ever reaches that origin
+            proxy_host, proxy_port, auth = route
+            if scheme == 'http':
+                return http.client.HTTPConnection(proxy_host, proxy_port, timeout=self.timeout), False
+            conn = http.client.HTTPSConnection(proxy_host, proxy_port, timeout=self.timeout, context=self._ssl)
+            conn.set_tunnel(host, port, headers=auth)
+            return conn, False
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _release(self, key: _Key, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, deque())
+            if len(conns) < self.max_per_host:
+                conns.append((conn, time.monotonic()))
+                return
+        conn.close()
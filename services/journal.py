@@ -0,0 +1,216 @@
+import gc, json, os, queue, threading, time
+from typing import Dict, List, Optional, Tuple
+
+from services.downloader import DownloadItem
+
+JOURNAL_NAME = "downloads.journal"   # in data_dir()
+WRITE_BATCH = 1000
+FSYNC_INTERVAL = 1.0       # seconds; flushed to the OS on every batch, to disk at most this often
+COMPACT_MIN = 10_000       # records appended before compaction is considered
+COMPACT_RATIO = 2          # ...and only once they outnumber live items this many times
+
+# One JSON array per line:
+#   ["a", key, url, dest, priority, limit, status, size, error]   item added (or compacted snapshot)
+#   ["s", key, status, dest, size, error]                         status transition
+#   ["p", key, priority, limit]                                   priority or bandwidth cap changed
+_ADD, _STATUS, _PRIO = "a", "s", "p"
+
+class DownloadJournal:
+    """Append-only, crash-safe log of the download queue.
+
+    Records are appended by a background thread in batches; a torn final line
+    from a crash is ignored on replay. Once appended records greatly outnumber
+    the live items, the file is rewritten as one snapshot record per item
+    (write, fsync, rename). `restore` replays the file into fresh
+    DownloadItems; items that were downloading are put back to queued so they
+    can resume from their sidecar.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[Optional[list]]" = queue.Queue()
+        self._keys: Dict[int, int] = {}          # DownloadItem.id → journal key
+        self._state: Dict[int, list] = {}        # journal key → latest "a" record
+        self._next_key = 1
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    # ---- restore ----
+    def restore(self) -> Tuple[List[DownloadItem], List[DownloadItem]]:
+        """Replay the journal: (every item, the interrupted ones to restart). Call once, before recording."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        # Replay allocates hundreds of thousands of acyclic lists; collector passes over them are pure cost
+        paused = gc.isenabled(); gc.disable()
+        try:
+            return self._replay(data)
+        finally:
+            if paused: gc.enable()
+
+    def _replay(self, data: bytes) -> Tuple[List[DownloadItem], List[DownloadItem]]:
+        records = _parse(data)
+        state = self._state
+        for r in records:
+            kind, key = r[0], r[1]
+            if kind == _ADD:
+                state[key] = r
+            elif key in state:
+                snap = state[key]
+                if kind == _STATUS:
+                    snap[6], snap[3], snap[7], snap[8] = r[2], r[3], r[4], r[5]
+                elif kind == _PRIO:
+                    snap[4], snap[5] = r[2], r[3]
+        items, resumed = [], []
+        for key, (_, _, url, dest, priority, limit, status, size, error) in state.items():
+            interrupted = status == "downloading"
+            it = DownloadItem(url=url, dest=dest, priority=priority, limit=limit,
+                              status="queued" if interrupted else status,
+                              size_bytes=size, error=error, progress=100 if status == "done" else 0)
+            self._keys[it.id] = key
+            items.append(it)
+            if interrupted:
+                resumed.append(it)   # picks up from its .part sidecar once started
+        self._next_key = max(state, default=0) + 1
+        self._appended = len(records)
+        # Cut off a torn tail (a crash mid-write) so new records never follow half a line
+        if data and not data.endswith(b'\n'):
+            with open(self.path, 'r+b') as f:
+                f.truncate(data.rfind(b'\n') + 1)
+        self._writer = threading.Thread(target=self._write_loop, name="pyweb-journal", daemon=True)
+        self._writer.start()
+        return items, resumed
+
+    # ---- recording (any thread) ----
+    def add(self, item: DownloadItem) -> None:
+        with self._lock:
+            key = self._keys.get(item.id)
+            if key is None:
+                key = self._keys[item.id] = self._next_key
+                self._next_key += 1
+        self._put([_ADD, key, item.url, item.dest, item.priority, item.limit, item.status, item.size_bytes, item.error])
+
+    def update(self, item: DownloadItem) -> None:
+        key = self._keys.get(item.id)
+        if key is not None:
+            self._put([_STATUS, key, item.status, item.dest, item.size_bytes, item.error])
+
+    def update_priority(self, item: DownloadItem) -> None:
+        """Record a new queue position or speed cap."""
+        key = self._keys.get(item.id)
+        if key is not None:
+            self._put([_PRIO, key, item.priority, item.limit])
+
+    def _put(self, rec: list) -> None:
+        if self._writer is None:
+            raise RuntimeError("DownloadJournal.restore() must run before recording")
+        self._queue.put(rec)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        done = threading.Event()
+        self._queue.put(["sync", done])
+        done.wait(timeout)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(5.0)
+
+    # ---- writer thread ----
+    def _write_loop(self) -> None:
+        f = open(self.path, 'ab')
+        last_sync = time.monotonic()
+        while True:
+            recs = [self._queue.get()]
+            while len(recs) < WRITE_BATCH:
+                try:
+                    recs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in recs
+            syncs = [r[1] for r in recs if r and r[0] == "sync"]
+            recs = [r for r in recs if r and r[0] != "sync"]
+            try:
+                if recs:
+                    f.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in recs).encode('utf-8'))
+                    f.flush()
+                    for r in recs:
+                        self._apply(r)
+                    self._appended += len(recs)
+                now = time.monotonic()
+                if stop or syncs or now - last_sync >= FSYNC_INTERVAL:
+                    os.fsync(f.fileno()); last_sync = now
+                if self._appended >= max(COMPACT_MIN, COMPACT_RATIO * len(self._state)):
+                    f.close()
+                    self._compact()
+                    f = open(self.path, 'ab')
+            except OSError:
+                pass
+            for done in syncs:
+                done.set()
+            if stop:
+                f.close()
+                return
+
+    def _apply(self, r: list) -> None:
+        kind, key = r[0], r[1]
+        if kind == _ADD:
+            self._state[key] = list(r)
+            return
+        snap = self._state.get(key)
+        if snap is None:
+            return
+        if kind == _STATUS:
+            snap[6], snap[3], snap[7], snap[8] = r[2], r[3], r[4], r[5]
+        elif kind == _PRIO:
+            snap[4], snap[5] = r[2], r[3]
+
+    def _compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as out:
+            out.write(''.join(json.dumps(s, separators=(',', ':')) + '\n' for s in self._state.values()).encode('utf-8'))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.path)
+        self._appended = len(self._state)
+
+def interrupted(path: str) -> bool:
+    """Whether restoring the journal at `path` would resume a transfer; reads it without building any items."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return False
+    if b'"downloading"' not in data:
+        return False
+    status: Dict[int, str] = {}
+    for r in _parse(data):
+        if r[0] == _ADD:
+            status[r[1]] = r[6]
+        elif r[0] == _STATUS and r[1] in status:
+            status[r[1]] = r[2]
+    return "downloading" in status.values()
+
+def _parse(data: bytes) -> List[list]:
+    """All complete records; one C-level json parse for the common case, line by line after a crash."""
+    if not data:
+        return []
+    end = data.rfind(b'\n') + 1
+    body = data[:end].rstrip(b'\n')
+    if not body:
+        return []
+    try:
+        return json.loads(b'[' + body.replace(b'\n', b',') + b']')
+    except ValueError:
+        records = []
+        for line in data.splitlines():
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(r, list) and len(r) >= 2:
+                records.append(r)
+        return records
@@ -0,0 +1,264 @@
+import bisect, json, threading, time
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from services.downloader import DownloadItem
+
+# Upper bounds in seconds, Prometheus style; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RATE_WINDOW = 0.5    # seconds between instantaneous rate samples
+RATE_SMOOTHING = 0.5 # weight of the newest sample
+ITEM_HISTORY = 10_000  # finished items kept for the per-item rows of an export
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v; self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None when empty or beyond the last bound)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self) -> dict:
+        return {"buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+                "sum": round(self.sum, 6), "count": self.count}
+
+class _Rate:
+    """Bytes/second, sampled every RATE_WINDOW and smoothed."""
+    __slots__ = ("t", "mark", "value")
+
+    def __init__(self, now: float):
+        self.t, self.mark, self.value = now, 0, 0.0
+
+    def update(self, now: float, total: int) -> float:
+        dt = now - self.t
+        if dt >= RATE_WINDOW:
+            sample = (total - self.mark) / dt
+            self.value = sample if not self.value else RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * self.value
+            self.t, self.mark = now, total
+        return self.value
+
+class TransferMetrics:
+    """Per-item and aggregate download instrumentation.
+
+    The Downloader reports each attempt's start, every response's header
+    latency, every chunk and every retry. Per-item numbers land on the
+    DownloadItem itself (`bytes_done`, `rate`, `ttfb`, `retries`); totals,
+    status counts and per-host latency histograms live here. Exports
+    (`to_json` / `to_prometheus` or `dump`) carry all of that plus one row per
+    active and recently finished item with its TTFB and average rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._started: Dict[int, float] = {}
+        self._rates: Dict[int, _Rate] = {}
+        self._active: Dict[int, "DownloadItem"] = {}
+        self._finished: Deque[dict] = deque(maxlen=ITEM_HISTORY)
+        self._rate = _Rate(self._t0)
+        self.bytes_total = 0
+        self.retries_total = 0
+        self.requests_total = 0
+        self.statuses: Counter = Counter()
+        self.latency: Dict[str, Histogram] = {}   # host → time to response headers, every request
+        self.ttfb: Dict[str, Histogram] = {}      # host → item start to first response headers
+        self.busy_seconds = 0.0
+
+    # ---- downloader hooks ----
+    def begin(self, item: "DownloadItem") -> None:
+        now = time.monotonic()
+        item.bytes_done, item.rate, item.ttfb = 0, 0.0, None
+        with self._lock:
+            self._started[item.id] = now
+            self._rates[item.id] = _Rate(now)
+            self._active[item.id] = item
+
+    def response(self, item: "DownloadItem", seconds: float) -> None:
+        host = item.host
+        with self._lock:
+            self.requests_total += 1
+            self.latency.setdefault(host, Histogram()).observe(seconds)
+            if item.ttfb is None:
+                started = self._started.get(item.id)
+                item.ttfb = time.monotonic() - started if started is not None else seconds
+                self.ttfb.setdefault(host, Histogram()).observe(item.ttfb)
+
+    def progress(self, item: "DownloadItem", n: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            item.bytes_done += n
+            self.bytes_total += n
+            r = self._rates.get(item.id)
+            if r is not None:
+                item.rate = r.update(now, item.bytes_done)
+            self._rate.update(now, self.bytes_total)
+
+    def restart(self, item: "DownloadItem", done: int = 0) -> None:
+        """The item's bytes start over at `done` (a new attempt, or a resumed sidecar)."""
+        with self._lock:
+            item.bytes_done = done
+            r = self._rates.get(item.id)
+            if r is not None:
+                r.mark = done
+
+    def retry(self, item: "DownloadItem") -> None:
+        with self._lock:
+            item.retries += 1
+            self.retries_total += 1
+
+    def finish(self, item: "DownloadItem") -> None:
+        now = time.monotonic()
+        with self._lock:
+            started = self._started.pop(item.id, None)
+            self._rates.pop(item.id, None)
+            self._active.pop(item.id, None)
+            elapsed = now - started if started is not None else 0.0
+            if started is not None:
+                self.busy_seconds += elapsed
+                item.rate = item.bytes_done / elapsed if elapsed > 0 else 0.0
+            self.statuses[item.status] += 1
+            self._finished.append(_item_row(item, item.rate, elapsed))
+
+    # ---- reading ----
+    def average_rate(self, item: "DownloadItem") -> float:
+        """Bytes/second since the item started; once finished, its final average (kept in `rate`)."""
+        started = self._started.get(item.id)
+        if started is None:
+            return item.rate
+        elapsed = time.monotonic() - started
+        return item.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def items(self) -> List[dict]:
+        """One row per active item, then per finished one (newest ITEM_HISTORY), oldest first."""
+        now = time.monotonic()
+        with self._lock:
+            active = [_item_row(it, self.average_rate(it), now - self._started[i]) for i, it in self._active.items()]
+            return list(self._finished) + active
+
+    @property
+    def rate(self) -> float:
+        """Aggregate bytes/second over the last few samples; decays to 0 once transfers stop."""
+        with self._lock:
+            return self._rate.update(time.monotonic(), self.bytes_total)
+
+    @property
+    def active(self) -> int:
+        return len(self._started)
+
+    def summary(self) -> str:
+        """One line for a status bar."""
+        ttfb = Histogram()
+        with self._lock:
+            for h in self.ttfb.values():
+                ttfb.counts = [a + b for a, b in zip(ttfb.counts, h.counts)]; ttfb.count += h.count
+        p50 = ttfb.quantile(0.5)
+        parts = [f"{self.active} active", f"{_human(self.rate)}/s", f"{_human(self.bytes_total)} total"]
+        if p50 is not None:
+            parts.append(f"ttfb ≤{p50*1000:.0f} ms (p50)")
+        if self.retries_total:
+            parts.append(f"{self.retries_total} retries")
+        return " · ".join(parts)
+
+    def snapshot(self) -> dict:
+        rate, items = self.rate, self.items()
+        with self._lock:
+            uptime = time.monotonic() - self._t0
+            return {
+                "uptime_s": round(uptime, 3),
+                "bytes_total": self.bytes_total,
+                "rate_bps": round(rate, 1),
+                "average_bps": round(self.bytes_total / uptime, 1) if uptime > 0 else 0.0,
+                "active": len(self._started),
+                "requests_total": self.requests_total,
+                "retries_total": self.retries_total,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "downloads": dict(self.statuses),
+                "hosts": {host: {"latency": self.latency[host].to_dict(),
+                                 "ttfb": self.ttfb[host].to_dict() if host in self.ttfb else None}
+                          for host in sorted(self.latency)},
+                "items": items,
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        s = self.snapshot()
+        out: List[str] = []
+
+        def metric(name: str, kind: str, help_: str, samples):
+            out.append(f"# HELP pyweb_{name} {help_}")
+            out.append(f"# TYPE pyweb_{name} {kind}")
+            for labels, value in samples:
+                out.append(f"pyweb_{name}{_labels(labels)} {value}")
+
+        metric("download_bytes_total", "counter", "Bytes received by downloads.", [({}, s["bytes_total"])])
+        metric("download_rate_bytes", "gauge", "Current aggregate download rate in bytes per second.", [({}, s["rate_bps"])])
+        metric("downloads_active", "gauge", "Downloads transferring now.", [({}, s["active"])])
+        metric("downloads_total", "counter", "Finished downloads by final status.",
+               [({"status": st}, n) for st, n in sorted(s["downloads"].items())])
+        metric("download_requests_total", "counter", "HTTP requests made by downloads.", [({}, s["requests_total"])])
+        metric("download_retries_total", "counter", "Download attempts retried after a transient error.",
+               [({}, s["retries_total"])])
+        latest = {(r["url"], r["dest"]): r for r in s["items"]}   # a restarted download is one series, not two
+        for name, key, help_ in (("download_item_ttfb_seconds", "ttfb_s", "Time from start to first response headers, per download."),
+                                 ("download_item_average_bytes", "average_bps", "Average bytes per second over a download's run."),
+                                 ("download_item_bytes", "bytes", "Bytes received by a download.")):
+            metric(name, "gauge", help_, [({"url": r["url"], "dest": r["dest"], "status": r["status"]}, r[key])
+                                          for r in latest.values() if r[key] is not None])
+        for name, key, help_ in (("request_latency_seconds", "latency", "Time from request to response headers."),
+                                 ("download_ttfb_seconds", "ttfb", "Time from download start to first response headers.")):
+            samples = []
+            for host, h in s["hosts"].items():
+                h = h[key]
+                if not h: continue
+                cum = 0
+                for le, n in h["buckets"].items():
+                    cum += n
+                    samples.append(({"host": host, "le": le}, cum))
+                samples.append(({"host": host, "__suffix": "_sum"}, h["sum"]))
+                samples.append(({"host": host, "__suffix": "_count"}, h["count"]))
+            out.append(f"# HELP pyweb_{name} {help_}")
+            out.append(f"# TYPE pyweb_{name} histogram")
+            for labels, value in samples:
+                suffix = labels.pop("__suffix", "_bucket")
+                out.append(f"pyweb_{name}{suffix}{_labels(labels)} {value}")
+        return "\n".join(out) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write a snapshot to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json() + "\n"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+def _item_row(item: "DownloadItem", average: float, seconds: float) -> dict:
+    return {"url": item.url, "dest": item.dest, "status": item.status, "bytes": item.bytes_done,
+            "ttfb_s": round(item.ttfb, 6) if item.ttfb is not None else None,
+            "average_bps": round(average, 1), "seconds": round(seconds, 3), "retries": item.retries}
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+def _human(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
@@ -0,0 +1,229 @@
+"""Page load profiling: navigation, resource and long-task timing streamed from tabs.
+
+The page side (PERF_JS, exposed as window.__pyweb.profile) runs
+PerformanceObserver for each entry type and posts every observer callback as
+one `pyweb/perf` message. PageProfile keeps what one tab's current document
+reported and turns it into a summary, waterfall rows or a HAR-like log.
+"""
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from services.webmsg import POST_JS
+
+PERF_TYPE = "pyweb/perf"
+MAX_ENTRIES = 5000       # resources kept per document; the rest are only counted
+RESOURCE_BUFFER = 2000   # page-side resource timing buffer, for entries from before profiling started
+
+# Function expression: profile(true) starts observing (buffered, so entries from before the
+# call are included), profile(false) stops. Times are ms from the document's time origin,
+# rounded to 0.1 ms; phases the browser does not expose (cross-origin without
+# Timing-Allow-Origin, reused connections) are null.
+PERF_JS = (
+    "(on => {"
+    "  " + POST_JS +
+    "  const st = window.__pywebPerf;"
+    "  if (!on) { if (st) { st.stop(); window.__pywebPerf = null; } return true; }"
+    "  if (st || !window.PerformanceObserver) return !!st;"
+    "  const r = v => Math.round(v * 10) / 10;"
+    "  const span = (a, b) => a > 0 && b >= a ? r(b - a) : null;"
+    "  const timing = e => ({ name: e.name, type: e.initiatorType || e.entryType, start: r(e.startTime), duration: r(e.duration),"
+    "    dns: span(e.domainLookupStart, e.domainLookupEnd), connect: span(e.connectStart, e.connectEnd),"
+    "    tls: e.secureConnectionStart > 0 ? span(e.secureConnectionStart, e.connectEnd) : null,"
+    "    ttfb: span(e.requestStart, e.responseStart), transfer: span(e.responseStart, e.responseEnd),"
+    "    size: e.transferSize || 0, body: e.encodedBodySize || 0, decoded: e.decodedBodySize || 0,"
+    "    protocol: e.nextHopProtocol || '', status: e.responseStatus || 0 });"
+    "  const kinds = {"
+    "    /* the document's own bar ends with its response; the page milestones go alongside */"
+    "    navigation: e => Object.assign(timing(e), { duration: r(e.responseEnd - e.startTime), nav: e.type, interactive: r(e.domInteractive),"
+    "      dcl: r(e.domContentLoadedEventEnd), load: r(e.loadEventEnd) }),"
+    "    resource: timing,"
+    "    longtask: e => ({ name: e.name, start: r(e.startTime), duration: r(e.duration) }),"
+    "  };"
+    "  try { performance.setResourceTimingBufferSize(%d); } catch (e) {}"
+    "  const origin = performance.timeOrigin, page = location.href, observers = [];"
+    "  for (const kind in kinds) {"
+    "    try {"
+    "      const o = new PerformanceObserver(list => {"
+    "        const entries = list.getEntries().map(kinds[kind]);"
+    "        if (entries.length) post({ type:%r, kind, origin, page, entries });"
+    "      });"
+    "      o.observe({ type: kind, buffered: true });"
+    "      observers.push(o);"
+    "    } catch (e) {}"
+    "  }"
+    "  window.__pywebPerf = { stop(){ observers.forEach(o => o.disconnect()); } };"
+    "  return true;"
+    "})"
+) % (RESOURCE_BUFFER, PERF_TYPE)
+
+def _num(v) -> Optional[float]:
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0 else None
+
+@dataclass
+class ResourceTiming:
+    name: str
+    type: str
+    start: float
+    duration: float
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    tls: Optional[float] = None
+    ttfb: Optional[float] = None
+    transfer: Optional[float] = None
+    size: int = 0       # bytes on the wire, headers included; 0 when cached or cross-origin
+    body: int = 0       # encoded body bytes
+    decoded: int = 0
+    protocol: str = ""
+    status: int = 0
+
+    @classmethod
+    def from_msg(cls, e: dict) -> "ResourceTiming":
+        return cls(str(e.get('name') or ''), str(e.get('type') or 'other'),
+                   _num(e.get('start')) or 0.0, _num(e.get('duration')) or 0.0,
+                   _num(e.get('dns')), _num(e.get('connect')), _num(e.get('tls')),
+                   _num(e.get('ttfb')), _num(e.get('transfer')),
+                   int(_num(e.get('size')) or 0), int(_num(e.get('body')) or 0), int(_num(e.get('decoded')) or 0),
+                   str(e.get('protocol') or ''), int(_num(e.get('status')) or 0))
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @property
+    def blocked(self) -> Optional[float]:
+        """Time the measured phases leave unexplained (queueing, stalls); None without phase detail."""
+        known = sum(p or 0.0 for p in (self.dns, self.connect, self.ttfb, self.transfer))
+        return max(0.0, self.duration - known) if self.ttfb is not None else None
+
+@dataclass
+class NavigationTiming(ResourceTiming):
+    nav: str = "navigate"
+    interactive: Optional[float] = None
+    dcl: Optional[float] = None    # DOMContentLoaded handlers done
+    load: Optional[float] = None   # load handlers done
+
+    @classmethod
+    def from_msg(cls, e: dict) -> "NavigationTiming":
+        base = ResourceTiming.from_msg(e)
+        return cls(**base.__dict__, nav=str(e.get('nav') or 'navigate'),
+                   interactive=_num(e.get('interactive')), dcl=_num(e.get('dcl')), load=_num(e.get('load')))
+
+@dataclass
+class LongTask:
+    start: float
+    duration: float
+    name: str = "self"
+
+@dataclass
+class PageProfile:
+    """Timing reported by one tab's current document; a new document starts a fresh profile."""
+    url: str = ""
+    origin: float = 0.0   # performance.timeOrigin, ms since the epoch
+    navigation: Optional[NavigationTiming] = None
+    resources: List[ResourceTiming] = field(default_factory=list)
+    long_tasks: List[LongTask] = field(default_factory=list)
+    overflow: int = 0     # resources past MAX_ENTRIES
+
+    def add(self, msg: dict) -> bool:
+        """Fold in one pyweb/perf message; True when it began a new document."""
+        origin = _num(msg.get('origin')) or 0.0
+        fresh = origin != self.origin
+        if fresh:
+            self.url, self.origin, self.navigation, self.overflow = str(msg.get('page') or ''), origin, None, 0
+            self.resources, self.long_tasks = [], []
+        kind, entries = msg.get('kind'), [e for e in msg.get('entries') or () if isinstance(e, dict)]
+        if kind == 'navigation' and entries:
+            self.navigation = NavigationTiming.from_msg(entries[-1])
+        elif kind == 'resource':
+            room = MAX_ENTRIES - len(self.resources)
+            self.resources.extend(ResourceTiming.from_msg(e) for e in entries[:max(0, room)])
+            self.overflow += max(0, len(entries) - room)
+        elif kind == 'longtask':
+            self.long_tasks.extend(LongTask(_num(e.get('start')) or 0.0, _num(e.get('duration')) or 0.0,
+                                            str(e.get('name') or 'self')) for e in entries)
+        return fresh
+
+    def waterfall(self) -> List[ResourceTiming]:
+        """The document, then its resources, in start order."""
+        rows = sorted(self.resources, key=lambda r: r.start)
+        return [self.navigation] + rows if self.navigation else rows
+
+    @property
+    def span(self) -> float:
+        """ms from the time origin to the last thing that finished."""
+        ends = [r.end for r in self.resources] + [t.start + t.duration for t in self.long_tasks]
+        if self.navigation:
+            ends += [self.navigation.end, self.navigation.load or 0.0]
+        return max(ends, default=0.0)
+
+    def summary(self) -> dict:
+        by_type: Dict[str, dict] = {}
+        for r in self.resources:
+            t = by_type.setdefault(r.type, {"count": 0, "bytes": 0, "ms": 0.0})
+            t["count"] += 1; t["bytes"] += r.size; t["ms"] += r.duration
+        nav = self.navigation
+        ttfbs = sorted(r.ttfb for r in self.resources if r.ttfb is not None)
+        return {
+            "url": self.url,
+            "requests": len(self.resources) + self.overflow + (1 if nav else 0),
+            "bytes": sum(r.size for r in self.resources) + (nav.size if nav else 0),
+            "ttfb": nav.ttfb if nav else None,
+            "dom_content_loaded": nav.dcl if nav else None,
+            "load": nav.load if nav else None,
+            "resource_ttfb_p50": ttfbs[len(ttfbs) // 2] if ttfbs else None,
+            "long_tasks": len(self.long_tasks),
+            "long_task_ms": round(sum(t.duration for t in self.long_tasks), 1),
+            "by_type": {k: dict(v, ms=round(v["ms"], 1)) for k, v in sorted(by_type.items(), key=lambda kv: -kv[1]["bytes"])},
+            "span": round(self.span, 1),
+        }
+
+    def summary_text(self) -> str:
+        s = self.summary()
+        parts = [f"{s['requests']} requests", f"{_kb(s['bytes'])} transferred"]
+        for label, key in (("TTFB", "ttfb"), ("DOMContentLoaded", "dom_content_loaded"), ("load", "load")):
+            if s[key]:
+                parts.append(f"{label} {s[key]:.0f} ms")
+        if s["long_tasks"]:
+            parts.append(f"{s['long_tasks']} long tasks ({s['long_task_ms']:.0f} ms)")
+        lines = [" · ".join(parts)]
+        lines += [f"{t}: {v['count']} · {_kb(v['bytes'])}" for t, v in list(s["by_type"].items())[:6]]
+        return "\n".join(lines)
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:.1f} KB" if n < 1024*1024 else f"{n / 1024 / 1024:.1f} MB"
+
+def _iso(epoch_ms: float) -> str:
+    return datetime.datetime.fromtimestamp(epoch_ms / 1000, datetime.timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def _ms(v: Optional[float]) -> float:
+    return round(v, 3) if v is not None else -1
+
+def to_har(profiles: Iterable[PageProfile]) -> dict:
+    """A HAR 1.2 shaped log. Resource Timing carries no headers, methods or MIME types,
+    so those fields are empty; `_`-prefixed fields carry what HAR has no slot for."""
+    pages, entries = [], []
+    for i, p in enumerate(profiles, 1):
+        ref = f"page_{i}"
+        nav = p.navigation
+        pages.append({"startedDateTime": _iso(p.origin), "id": ref, "title": p.url,
+                      "pageTimings": {"onContentLoad": _ms(nav.dcl if nav else None), "onLoad": _ms(nav.load if nav else None)},
+                      "_longTasks": [{"start": t.start, "duration": t.duration, "name": t.name} for t in p.long_tasks],
+                      "_droppedEntries": p.overflow})
+        for r in p.waterfall():
+            entries.append({
+                "pageref": ref,
+                "startedDateTime": _iso(p.origin + r.start),
+                "time": round(r.duration, 3),
+                "request": {"method": "GET", "url": r.name, "httpVersion": r.protocol, "cookies": [], "headers": [],
+                            "queryString": [], "headersSize": -1, "bodySize": -1},
+                "response": {"status": r.status, "statusText": "", "httpVersion": r.protocol, "cookies": [], "headers": [],
+                             "content": {"size": r.decoded, "mimeType": ""}, "redirectURL": "",
+                             "headersSize": -1, "bodySize": r.body, "_transferSize": r.size},
+                "cache": {},
+                "timings": {"blocked": _ms(r.blocked), "dns": _ms(r.dns), "connect": _ms(r.connect), "ssl": _ms(r.tls),
+                            "send": 0, "wait": _ms(r.ttfb), "receive": _ms(r.transfer)},
+                "_initiatorType": r.type,
+            })
+    return {"log": {"version": "1.2", "creator": {"name": "PyWeb", "version": ""},
+                    "pages": pages, "entries": entries}}
@@ -0,0 +1,170 @@
+"""Post-download checks run in worker processes: hash, verify, measure, thumbnail.
+
+A pipeline is a list of steps, each a picklable top-level function
+`step(path, result, opts)` that fills in `result` (a PostResult) and may raise
+to mark the file bad. Steps are named in STEPS or given as "module:function".
+Image decoding and thumbnails use Pillow (in requirements.txt); should it be
+missing, dimensions still come from the header parser in services.probe and
+no thumbnail is made. A hash the downloader already computed is passed in
+rather than read back from disk.
+"""
+import hashlib, importlib, multiprocessing, os, threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from services.download_index import file_sha256
+from services.probe import HEAD_BYTES, image_dimensions
+
+THUMB_SIZE = (32, 32)
+
+@dataclass
+class PostResult:
+    path: str
+    size: int = 0
+    sha256: Optional[str] = None
+    kind: Optional[str] = None     # 'png', 'jpeg', … for images
+    width: Optional[int] = None
+    height: Optional[int] = None
+    verified: Optional[bool] = None   # None: not an image, or nothing could decode it
+    thumbnail: Optional[str] = None
+    error: Optional[str] = None
+
+@dataclass
+class Options:
+    thumb_dir: Optional[str] = None
+    thumb_size: Tuple[int, int] = THUMB_SIZE
+
+def _pillow():
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        return None
+
+def step_hash(path: str, r: PostResult, opts: Options) -> None:
+    r.sha256 = r.sha256 or file_sha256(path)
+
+def step_dimensions(path: str, r: PostResult, opts: Options) -> None:
+    with open(path, 'rb') as f:
+        dims = image_dimensions(f.read(HEAD_BYTES))
+    if dims:
+        r.kind, r.width, r.height = dims
+
+def step_verify(path: str, r: PostResult, opts: Options) -> None:
+    Image = _pillow()
+    if Image is None:
+        return
+    try:
+        with Image.open(path) as im:
+            im.verify()   # structure and checksums, without decoding every pixel
+            r.kind = r.kind or (im.format or '').lower() or None
+        with Image.open(path) as im:
+            r.width, r.height = im.size
+    except Exception as e:
+        if r.kind:   # the header said image: a failed decode means a broken file
+            r.verified = False
+            raise ValueError(f"corrupt {r.kind}: {e}") from None
+        return
+    r.verified = True
+
+def step_thumbnail(path: str, r: PostResult, opts: Options) -> None:
+    Image = _pillow()
+    if Image is None or not opts.thumb_dir or not r.kind or r.verified is False:
+        return
+    tw, th = opts.thumb_size
+    key = r.sha256 or hashlib.sha1(f"{path}:{os.path.getmtime(path)}".encode()).hexdigest()
+    out = os.path.join(opts.thumb_dir, f"{key[:32]}-{tw}x{th}.png")
+    if not os.path.exists(out):
+        with Image.open(path) as im:
+            im.draft('RGB', (tw * 2, th * 2))   # JPEG: decode at reduced scale
+            im = im.convert('RGBA')
+            im.thumbnail((tw, th))
+            # Centred on a transparent square so every row of the list lines up
+            canvas = Image.new('RGBA', (tw, th), (0, 0, 0, 0))
+            canvas.paste(im, ((tw - im.width) // 2, (th - im.height) // 2))
+            tmp = out + f".{os.getpid()}.tmp"
+            canvas.save(tmp, 'PNG')
+            os.replace(tmp, out)
+    r.thumbnail = out
+
+STEPS: Dict[str, Callable[[str, PostResult, Options], None]] = {
+    "hash": step_hash,
+    "dimensions": step_dimensions,
+    "verify": step_verify,
+    "thumbnail": step_thumbnail,
+}
+DEFAULT_STEPS = ("hash", "dimensions", "verify", "thumbnail")
+
+StepSpec = Union[str, Callable[[str, PostResult, Options], None]]
+
+def resolve(step: StepSpec) -> Callable[[str, PostResult, Options], None]:
+    if callable(step):
+        return step
+    if step in STEPS:
+        return STEPS[step]
+    mod, _, name = step.partition(':')
+    if not name:
+        raise ValueError(f"unknown post-processing step {step!r}")
+    return getattr(importlib.import_module(mod), name)
+
+def run_pipeline(path: str, steps: Sequence[StepSpec], opts: Options, sha256: Optional[str] = None) -> PostResult:
+    """Run `steps` over `path` in order; the first failure stops the pipeline and is recorded."""
+    r = PostResult(path, sha256=sha256)
+    try:
+        r.size = os.path.getsize(path)
+        for step in steps:
+            resolve(step)(path, r, opts)
+    except Exception as e:
+        r.error = str(e)
+    return r
+
+class PostProcessor:
+    """Runs the pipeline for finished downloads on a process pool.
+
+    The pool is started on first use with the spawn method (never fork a GUI
+    process) and sized to the CPU count by default. `on_done(key, result)` is
+    called on a pool management thread; GUI callers marshal it themselves.
+    """
+
+    def __init__(self, on_done: Callable[[object, PostResult], None], thumb_dir: Optional[str] = None,
+                 workers: Optional[int] = None, steps: Sequence[StepSpec] = DEFAULT_STEPS,
+                 thumb_size: Tuple[int, int] = THUMB_SIZE):
+        for step in steps:
+            if not isinstance(step, str):
+                resolve(step)
+            elif step not in STEPS and ':' not in step:
+                raise ValueError(f"unknown post-processing step {step!r}")
+        self.on_done = on_done
+        self.steps: List[StepSpec] = list(steps)
+        self.opts = Options(thumb_dir, tuple(thumb_size))
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._exec: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        if thumb_dir:
+            os.makedirs(thumb_dir, exist_ok=True)
+
+    def submit(self, key: object, path: str, sha256: Optional[str] = None) -> Optional[Future]:
+        """Queue `path`; pass its `sha256` when already known so the hash step need not read it again."""
+        with self._lock:
+            if self._closed:
+                return None
+            if self._exec is None:
+                self._exec = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            fut = self._exec.submit(run_pipeline, path, self.steps, self.opts, sha256)
+        fut.add_done_callback(lambda f: self._finished(key, path, f))
+        return fut
+
+    def _finished(self, key: object, path: str, fut: Future) -> None:
+        if fut.cancelled():
+            return
+        exc = fut.exception()
+        self.on_done(key, PostResult(path, error=f"post-processing failed: {exc}") if exc else fut.result())
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            ex, self._exec = self._exec, None
+        if ex is not None:
+            ex.shutdown(wait=False, cancel_futures=True)
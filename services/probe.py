@@ -0,0 +1,137 @@
+import struct, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from services.http_pool import HttpPool
+from services.segments import CONTENT_RANGE
+
+HEAD_BYTES = 64*1024   # enough for the header of every format below, EXIF included in most JPEGs
+
+@dataclass
+class ImageMeta:
+    url: str
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        """Short type name, e.g. 'jpeg', 'png', or '' when unknown."""
+        ct = (self.content_type or '').split(';')[0].strip().lower()
+        return ct.split('/', 1)[1] if ct.startswith('image/') else ct
+
+def image_dimensions(head: bytes) -> Optional[Tuple[str, int, int]]:
+    """(format, width, height) parsed from the first bytes of a PNG, GIF, JPEG, WebP or BMP file."""
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and len(head) >= 24:
+        w, h = struct.unpack('>II', head[16:24])
+        return 'png', w, h
+    if head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+        w, h = struct.unpack('<HH', head[6:10])
+        return 'gif', w, h
+    if head[:2] == b'BM' and len(head) >= 26:
+        w, h = struct.unpack('<ii', head[18:26])
+        return 'bmp', w, abs(h)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP' and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b'VP8 ':
+            w, h = struct.unpack('<HH', head[26:30])
+            return 'webp', w & 0x3fff, h & 0x3fff
+        if chunk == b'VP8L':
+            b = head[21:25]
+            w = 1 + (((b[1] & 0x3f) << 8) | b[0])
+            h = 1 + (((b[3] & 0xf) << 10) | (b[2] << 2) | ((b[1] & 0xc0) >> 6))
+            return 'webp', w, h
+        if chunk == b'VP8X':
+            w = 1 + int.from_bytes(head[24:27], 'little')
+            h = 1 + int.from_bytes(head[27:30], 'little')
+            return 'webp', w, h
+    if head[:2] == b'\xff\xd8':
+        i = 2
+        while i + 9 < len(head):
+            if head[i] != 0xff:
+                i += 1; continue
+            marker = head[i+1]
+            if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7:
+                i += 2; continue
+            seg_len = struct.unpack('>H', head[i+2:i+4])[0]
+            # SOF0..SOF15 carry the frame size, except DHT (c4), JPG (c8) and DAC (cc)
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                h, w = struct.unpack('>HH', head[i+5:i+9])
+                return 'jpeg', w, h
+            i += 2 + seg_len
+    return None
+
+class MetadataProbe:
+    """Fetches content type, byte size and pixel dimensions for many URLs at once.
+
+    Each URL costs one ranged GET for its first HEAD_BYTES on the shared
+    connection pool; results are cached per URL in an LRU of `cache_size`.
+    """
+
+    def __init__(self, pool: Optional[HttpPool] = None, max_workers: int = 6, cache_size: int = 4096):
+        self.pool = pool or HttpPool(max_per_host=max_workers, timeout=20)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, ImageMeta]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._exec = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pyweb-probe")
+
+    def cached(self, url: str) -> Optional[ImageMeta]:
+        with self._lock:
+            meta = self._cache.get(url)
+            if meta is not None:
+                self._cache.move_to_end(url)
+            return meta
+
+    def submit(self, urls: Iterable[str], on_result: Callable[[ImageMeta], None]) -> List[Future]:
+        """Probe `urls` in the background; `on_result` runs on a worker thread per URL.
+
+        Returns the queued probes; cancel them when their results are no longer wanted.
+        """
+        futures = []
+        for url in urls:
+            meta = self.cached(url)
+            if meta is not None:
+                on_result(meta)
+            else:
+                futures.append(self._exec.submit(lambda u=url: on_result(self.probe(u))))
+        return futures
+
+    def probe(self, url: str) -> ImageMeta:
+        meta = self.cached(url)
+        if meta is not None:
+            return meta
+        meta = ImageMeta(url)
+        try:
+            with self.pool.request(url, headers={'Range': f'bytes=0-{HEAD_BYTES-1}', 'Accept-Encoding': 'identity'}) as resp:
+                meta.content_type = resp.headers.get('Content-Type')
+                m = CONTENT_RANGE.match(resp.headers.get('Content-Range') or '')
+                length = resp.headers.get('Content-Length')
+                if resp.status == 206 and m:
+                    meta.size = int(m.group(1))
+                elif length and length.isdigit():
+                    meta.size = int(length)
+                head = b''
+                while len(head) < HEAD_BYTES:
+                    chunk = resp.read(HEAD_BYTES - len(head))
+                    if not chunk: break
+                    head += chunk
+            dims = image_dimensions(head)
+            if dims:
+                fmt, meta.width, meta.height = dims
+                if not meta.kind:
+                    meta.content_type = f"image/{fmt}"
+        except Exception as e:
+            meta.error = str(e)
+        with self._lock:
+            self._cache[url] = meta
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return meta
+
+    def close(self) -> None:
+        self._exec.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
@@ -0,0 +1,42 @@
+import threading
+from typing import Callable, Dict, List
+
+from services.downloader import DownloadItem
+
+FLUSH_HZ = 10
+
+class ProgressBus:
+    """Coalesces download updates between worker threads and the UI.
+
+    Workers `post` on every chunk; only the latest state per item is kept and
+    the UI pulls it with `drain` at a fixed rate. A status change (queued →
+    downloading → done/error/…) skips the queue and goes to `on_status`
+    straight away, on the posting thread.
+    """
+
+    def __init__(self, on_status: Callable[[DownloadItem], None]):
+        self.on_status = on_status
+        self._dirty: Dict[int, DownloadItem] = {}
+        self._status: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.posted = 0
+
+    def post(self, item: DownloadItem) -> None:
+        status = item.status
+        with self._lock:
+            # Segment threads of one item post concurrently: only one of them may see a transition
+            self.posted += 1
+            changed = self._status.get(item.id) != status
+            if changed:
+                self._status[item.id] = status
+                self._dirty.pop(item.id, None)
+            else:
+                self._dirty[item.id] = item
+        if changed:
+            self.on_status(item)   # outside the lock: it journals and calls into the UI
+
+    def drain(self) -> List[DownloadItem]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        return list(dirty.values())
+
@@ -0,0 +1,95 @@
+import json, os, re
+from dataclasses import dataclass, field, asdict
+from typing import Optional, List
+
+from services.http_pool import HttpPool
+
+PART_SUFFIX = ".part"
+TEMP_SUFFIX = ".download"   # data is written here and renamed to the final name when complete
+
+CONTENT_RANGE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+@dataclass
+class RangeInfo:
+    size: Optional[int]
+    ranges: bool
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+@dataclass
+class Segment:
+    start: int
+    end: int        # inclusive
+    done: int = 0   # bytes already on disk from `start`
+
+    @property
+    def offset(self) -> int:
+        return self.start + self.done
+
+    @property
+    def complete(self) -> bool:
+        return self.offset > self.end
+
+@dataclass
+class SegmentPlan:
+    url: str
+    size: int
+    etag: Optional[str] = None
+    segments: List[Segment] = field(default_factory=list)
+
+    @property
+    def done_bytes(self) -> int:
+        return sum(s.done for s in self.segments)
+
+    @property
+    def complete(self) -> bool:
+        return all(s.complete for s in self.segments)
+
+    def matches(self, url: str, info: RangeInfo) -> bool:
+        return self.url == url and self.size == info.size and (not self.etag or not info.etag or self.etag == info.etag)
+
+def probe(pool: HttpPool, url: str) -> RangeInfo:
+    """Ask for the first byte; a 206 with Content-Range means the server can serve ranges."""
+    with pool.request(url, headers={'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'}) as resp:
+        h = resp.headers
+        m = CONTENT_RANGE.match(h.get('Content-Range') or '')
+        if resp.status == 206 and m:
+            return RangeInfo(int(m.group(1)), True, h.get('ETag'), h.get('Last-Modified'))
+        length = h.get('Content-Length')
+        return RangeInfo(int(length) if length and length.isdigit() else None, False, h.get('ETag'), h.get('Last-Modified'))
+
+def plan(url: str, info: RangeInfo, count: int, min_size: int) -> SegmentPlan:
+    """Split `info.size` bytes into at most `count` ranges of at least `min_size` bytes."""
+    size = info.size or 0
+    count = max(1, min(count, size // max(1, min_size)))
+    step = -(-size // count)
+    segs = [Segment(start, min(start + step, size) - 1) for start in range(0, size, step)]
+    return SegmentPlan(url=url, size=size, etag=info.etag, segments=segs)
+
+def part_path(dest: str) -> str:
+    return dest + PART_SUFFIX
+
+def temp_path(dest: str) -> str:
+    return dest + TEMP_SUFFIX
+
+def load_part(dest: str) -> Optional[SegmentPlan]:
+    try:
+        with open(part_path(dest), 'r', encoding='utf-8') as f:
+            d = json.load(f)
+        return SegmentPlan(url=d['url'], size=d['size'], etag=d.get('etag'),
+                           segments=[Segment(**s) for s in d['segments']])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_part(dest: str, p: SegmentPlan) -> None:
+    # Write-then-rename so a crash never leaves a truncated sidecar behind
+    tmp = part_path(dest) + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(asdict(p), f)
+    os.replace(tmp, part_path(dest))
+
+def drop_part(dest: str) -> None:
+    try:
+        os.remove(part_path(dest))
+    except OSError:
+        pass
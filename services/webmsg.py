@@ -0,0 +1,153 @@
+import json, time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+BATCH_TYPE = "pyweb/batch"
+PAGE_QUEUE_MAX = 1000      # messages a page may hold between frames before low-priority ones are dropped
+HOST_BUDGET = 0.008        # seconds of handler time per batch before low-priority messages are dropped
+FRAME_MSGS = 100           # messages per postMessage; the rest wait for the next frame
+FRAME_BYTES = 64*1024      # ...and serialized bytes, so big image batches go out a few per frame
+
+Handler = Callable[[Any, dict], None]   # (source, message), source is whatever posted it (a BrowserTab)
+
+# Page side: window.__pywebPost(msg) queues; once per animation frame (or every 100 ms
+# while the page is hidden and rAF is paused) the head of the queue, up to FRAME_MSGS
+# messages or FRAME_BYTES, goes out as one {type:'pyweb/batch', msgs, dropped}
+# postMessage (pre-serialized, so each message is stringified once) and the rest waits
+# for the next frame. Low-priority types are coalesced (only the newest per type
+# survives), go out once the normal queue has drained, and are the first dropped when
+# the queue overflows; `dropped` reports those losses per type.
+BRIDGE_JS = (
+    "(() => {"
+    "  if (window.__pywebPost) return true;"
+    "  const wv = window.chrome && window.chrome.webview;"
+    "  if (!wv) { window.__pywebPost = () => false; return false; }"
+    "  const LOW = new Set(%s), MAX = %d, SEND_MSGS = %d, SEND_BYTES = %d;"
+    "  let queue = [], low = new Map(), dropped = {}, armed = false;"
+    "  const drop = t => { dropped[t] = (dropped[t] || 0) + 1; };"
+    "  function flush(){"
+    "    armed = false;"
+    "    const parts = []; let bytes = 0, i = 0;"
+    "    const take = m => {"
+    "      const s = JSON.stringify(m);"
+    "      if (parts.length && (parts.length >= SEND_MSGS || bytes + s.length > SEND_BYTES)) return false;"
+    "      parts.push(s); bytes += s.length; return true;"
+    "    };"
+    "    while (i < queue.length && take(queue[i])) i++;"
+    "    queue = queue.slice(i);"
+    "    if (!queue.length) for (const [t, m] of low) { if (!take(m)) break; low.delete(t); }"
+    "    const d = dropped; dropped = {};"
+    "    if (parts.length || Object.keys(d).length)"
+    "      wv.postMessage(`{\"type\":${JSON.stringify(%r)},\"msgs\":[${parts.join(',')}],\"dropped\":${JSON.stringify(d)}}`);"
+    "    if (queue.length || low.size) arm();"
+    "  }"
+    "  function arm(){"
+    "    if (armed) return; armed = true;"
+    "    if (document.hidden) setTimeout(flush, 100); else requestAnimationFrame(flush);"
+    "  }"
+    "  window.__pywebPost = m => {"
+    "    if (LOW.has(m.type)) {"
+    "      if (low.has(m.type)) drop(m.type);"
+    "      else if (queue.length + low.size >= MAX) { drop(m.type); return false; }"
+    "      low.set(m.type, m);"
+    "    } else {"
+    "      if (queue.length + low.size >= MAX && low.size) { const [t] = low.keys(); low.delete(t); drop(t); }"
+    "      queue.push(m);"
+    "    }"
+    "    arm(); return true;"
+    "  };"
+    "  return true;"
+    "})();"
+)
+
+# Prefix for scripts that post: uses the bridge when present, else posts directly
+POST_JS = ("const post = m => window.__pywebPost ? window.__pywebPost(m)"
+           " : (window.chrome && window.chrome.webview && window.chrome.webview.postMessage(m));")
+
+@dataclass
+class _Route:
+    handler: Handler
+    low: bool
+
+class MessageChannel:
+    """Routes page messages to handlers registered per message `type`.
+
+    A raw WebView message string is parsed once; batches from the page bridge
+    are unpacked in order. Handlers of `low` priority types run only while the
+    batch has spent less than `budget` seconds in handlers, so a burst of
+    them (favicon swaps from a page animating its icon) cannot monopolise
+    the UI thread; what is skipped is counted in `dropped`, alongside drops
+    the page itself reported.
+    """
+
+    def __init__(self, budget: float = HOST_BUDGET, queue_max: int = PAGE_QUEUE_MAX):
+        self.budget = budget
+        self.queue_max = queue_max
+        self._routes: Dict[str, _Route] = {}
+        self.received: Counter = Counter()
+        self.dropped: Counter = Counter()
+        self.unhandled: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.batches = 0
+        self.posts = 0
+        self._t0 = time.monotonic()
+
+    def register(self, type_: str, handler: Handler, low: bool = False) -> None:
+        self._routes[type_] = _Route(handler, low)
+
+    def unregister(self, type_: str) -> None:
+        self._routes.pop(type_, None)
+
+    def bridge_js(self) -> str:
+        """The page-side bridge, told which registered types may be coalesced and dropped."""
+        low = sorted(t for t, r in self._routes.items() if r.low)
+        return BRIDGE_JS % (json.dumps(low), self.queue_max, FRAME_MSGS, FRAME_BYTES, BATCH_TYPE)
+
+    def dispatch(self, source: Any, raw: str) -> None:
+        self.posts += 1
+        try:
+            msg = json.loads(raw) if raw and raw[0] in '{[' else {'text': raw}
+        except ValueError:
+            self.errors['<parse>'] += 1
+            return
+        if isinstance(msg, dict) and msg.get('type') == BATCH_TYPE:
+            self.batches += 1
+            for t, n in (msg.get('dropped') or {}).items():
+                if isinstance(n, int): self.dropped[t] += n
+            self.deliver(source, msg.get('msgs') or ())
+        else:
+            self.deliver(source, (msg,))
+
+    def deliver(self, source: Any, msgs: Iterable[Any]) -> None:
+        start = time.perf_counter()
+        for m in msgs:
+            if not isinstance(m, dict):
+                continue
+            t = m.get('type') or ''
+            self.received[t] += 1
+            route = self._routes.get(t)
+            if route is None:
+                self.unhandled[t] += 1
+                continue
+            if route.low and time.perf_counter() - start > self.budget:
+                self.dropped[t] += 1
+                continue
+            try:
+                route.handler(source, m)
+            except Exception:
+                self.errors[t] += 1
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-type counts and rates (messages/s since the channel was created)."""
+        elapsed = max(1e-9, time.monotonic() - self._t0)
+        types = set(self.received) | set(self.dropped)
+        return {t: {"received": self.received[t], "per_s": round(self.received[t] / elapsed, 2),
+                    "dropped": self.dropped[t], "unhandled": self.unhandled[t], "errors": self.errors[t]}
+                for t in sorted(types)}
+
+    def summary(self, top: Optional[int] = None) -> str:
+        rows = sorted(self.stats().items(), key=lambda kv: -kv[1]["received"])[:top]
+        lines = [f"{self.posts} posts, {self.batches} batches"]
+        lines += [f"{t}: {s['received']} ({s['per_s']}/s), {s['dropped']} dropped" for t, s in rows]
+        return "\n".join(lines)
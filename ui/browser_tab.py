@@ -1,10 +1,10 @@
+import json, time
 import wx
 import wx.html2 as webview
 from typing import Callable, Optional
 
 from services import dom_select
-
-WebMessageHandler = Callable[[dict], None]
+from services.webmsg import MessageChannel
 
 WEBVIEW_BACKEND = getattr(webview, 'WebViewBackendEdge', webview.WebViewBackendDefault)
 
@@ -15,15 +15,30 @@ class BrowserTab(wx.Panel):
         parent: wx.Window,
         on_title_changed: Callable[["BrowserTab", str], None],
         on_new_window: Callable[[str], None],
-        on_webmsg: Optional[WebMessageHandler] = None,
+        channel: Optional[MessageChannel] = None,
+        on_loaded: Optional[Callable[["BrowserTab"], None]] = None,
     ) -> None:
         super().__init__(parent)
         self.on_title_changed = on_title_changed
         self.on_new_window = on_new_window
-        self.on_webmsg = on_webmsg
+        self.channel = channel
+        self.on_loaded = on_loaded
+        # Built once per tab; installed as a document-start user script where the backend allows
+        self._script = dom_select.page_script(channel.bridge_js()) if channel else dom_select.PAGE_API_JS
+        self._scripted = False
+        self.profiling = False   # page timing goes to the channel as pyweb/perf while set
+
+        self.url = ""
+        self.title = ""
+        self.last_active = time.monotonic()
+        self.view: Optional[webview.WebView] = None
+        self._placeholder: Optional[wx.StaticText] = None
+        self.SetSizer(wx.BoxSizer(wx.VERTICAL))
+        self._create_view()
 
+    def _create_view(self) -> None:
         self.view = webview.WebView.New(self, backend=WEBVIEW_BACKEND)
-        self.view.Bind(webview.EVT_WEBVIEW_TITLE_CHANGED, lambda e: on_title_changed(self, e.GetString()))
+        self.view.Bind(webview.EVT_WEBVIEW_TITLE_CHANGED, self._on_title)
         self.view.Bind(webview.EVT_WEBVIEW_NEWWINDOW, self._ev_new_window)
 
         # Page loaded → trigger favicon probe (bind to LOADED if present, else NAVIGATED)
@@ -39,52 +54,97 @@ class BrowserTab(wx.Panel):
                 self.view.Bind(webview.EVT_WEBVIEW_SCRIPT_MESSAGE_RECEIVED, self._on_script_message)
             except Exception:
                 pass
+        self._scripted = self._install_page_script()
+
+        self.GetSizer().Add(self.view, 1, wx.EXPAND)
+        self.Layout()
+
+    def _install_page_script(self) -> bool:
+        if not hasattr(self.view, 'AddUserScript'):
+            return False
+        try:
+            return bool(self.view.AddUserScript(self._script, webview.WEBVIEW_INJECT_AT_DOCUMENT_START))
+        except Exception:
+            return False
+
+    # ---- hibernation ----
+    @property
+    def hibernated(self) -> bool:
+        return self.view is None
 
-        s = wx.BoxSizer(wx.VERTICAL)
-        s.Add(self.view, 1, wx.EXPAND)
-        self.SetSizer(s)
+    def hibernate(self) -> None:
+        """Drop the WebView (and its backend process memory), keeping URL and title."""
+        if self.view is None:
+            return
+        self.url = self.view.GetCurrentURL() or self.url
+        self.title = self.view.GetCurrentTitle() or self.title
+        view, self.view = self.view, None
+        self.GetSizer().Detach(view)
+        view.Destroy()
+        self._placeholder = wx.StaticText(self, label=f"{self.title or self.url}\n\nSuspended — reloads when selected",
+                                          style=wx.ALIGN_CENTRE_HORIZONTAL)
+        self.GetSizer().AddStretchSpacer()
+        self.GetSizer().Add(self._placeholder, 0, wx.EXPAND | wx.ALL, 24)
+        self.GetSizer().AddStretchSpacer()
+        self.Layout()
+
+    def wake(self) -> None:
+        if self.view is not None:
+            return
+        self.GetSizer().Clear(delete_windows=True)
+        self._placeholder = None
+        self._create_view()
+        if self.url:
+            self.view.LoadURL(self.url)
 
     # ---- host helpers ----
     def load(self, url: str) -> None:
-        self.view.LoadURL(url)
+        self.url = url
+        if self.view is None:
+            self.wake()
+        else:
+            self.view.LoadURL(url)
 
     def eval_js(self, js: str) -> None:
+        if self.view is None:
+            return
         try:
             self.view.RunScript(js)
         except Exception:
             pass
 
+    def page_call(self, name: str, *args) -> None:
+        """Call window.__pyweb.<name>(*args) in the page; args go over as JSON."""
+        call = f"window.__pyweb&&window.__pyweb.{name}({','.join(json.dumps(a) for a in args)});"
+        # Without user scripts the API is only there once _on_loaded ran it; the guard makes resending harmless
+        self.eval_js(call if self._scripted else self._script + call)
+
     def start_hover_pick(self) -> None:
-        self.eval_js(dom_select.HOVER_JS)
+        self.page_call("pick")
+
+    def set_profiling(self, on: bool) -> None:
+        """Start or stop page timing reports; kept on across navigations until turned off."""
+        self.profiling = on
+        self.page_call("profile", on)
 
     # ---- events ----
+    def _on_title(self, evt: webview.WebViewEvent) -> None:
+        self.title = evt.GetString()
+        self.on_title_changed(self, self.title)
+
     def _ev_new_window(self, evt: webview.WebViewEvent) -> None:
         self.on_new_window(evt.GetURL())
         evt.Veto()
 
     def _on_script_message(self, evt) -> None:
-        if not self.on_webmsg:
-            return
-        try:
-            msg = evt.GetString()
-            import json
-            data = json.loads(msg) if msg and msg[0] in '{[' else {'text': msg}
-            self.on_webmsg(data)
-        except Exception:
-            pass
+        if self.channel:
+            self.channel.dispatch(self, evt.GetString())
 
     def _on_loaded(self, _evt) -> None:
-        # Ask the page for its favicon, defaulting to /favicon.ico if no link tag
-        js = (
-            "(function(){"
-            " var href='';"
-            " var el=document.querySelector('link[rel~=\"icon\"]')"
-            "        ||document.querySelector('link[rel=\"shortcut icon\"]')"
-            "        ||document.querySelector('link[rel=\"apple-touch-icon\"]');"
-            " if(el){ try{ href=new URL(el.href, location.href).href; }catch(e){ href=el.href; } }"
-            " if(!href){ try{ href=new URL('/favicon.ico', location.href).href; }catch(e){ href='/favicon.ico'; } }"
-            " if(window.chrome&&window.chrome.webview){ window.chrome.webview.postMessage({type:'pyweb/favicon', href}); }"
-            " return true;"
-            "})();"
-        )
-        self.eval_js(js)
+        if self.on_loaded:
+            self.on_loaded(self)
+        if not self._scripted:
+            # Fallback: the API (and its favicon report) arrives after load instead of at document start
+            self.eval_js(self._script)
+        if self.profiling:
+            self.page_call("profile", True)   # each document needs its own observers; buffered, so earlier entries come too
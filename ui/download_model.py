@@ -0,0 +1,172 @@
+import os
+from typing import Callable, Dict, List, Optional
+
+from services.downloader import DownloadItem
+from services.postprocess import PostResult
+
+COLUMNS = [("File", 240), ("Status", 100), ("Progress", 90), ("Size", 90), ("Image", 110), ("Speed", 90), ("TTFB", 70), ("From", 260)]
+IMAGE_COL = 4   # filled from post-processing results, not from the item
+STATUSES = ["queued", "downloading", "paused", "done", "error", "canceled"]
+MAX_DRIFT = 256   # row moves tolerated before the id → row index is rebuilt
+
+def _size_text(it: DownloadItem) -> str:
+    return f"{it.size_bytes/1024:.0f} KB" if it.size_bytes else '?'
+
+def _progress_text(it: DownloadItem) -> str:
+    # Unknown length: show what has arrived rather than a made-up percentage
+    if it.size_bytes or it.status == "done" or not it.bytes_done:
+        return f"{it.progress}%"
+    return f"{it.bytes_done/1024:.0f} KB"
+
+def _speed_text(it: DownloadItem) -> str:
+    if not it.rate:
+        return ''
+    text = f"{it.rate/1024/1024:.1f} MB/s" if it.rate >= 1024*1024 else f"{it.rate/1024:.0f} KB/s"
+    return text + (f" ({it.retries}×)" if it.retries else '')
+
+def _ttfb_text(it: DownloadItem) -> str:
+    return '' if it.ttfb is None else f"{it.ttfb*1000:.0f} ms" if it.ttfb < 10 else f"{it.ttfb:.0f} s"
+
+def _image_text(it: DownloadItem, r: Optional[PostResult]) -> str:
+    if r is None:
+        return '…' if it.status == "done" else ''
+    if r.error:
+        return "corrupt" if r.verified is False else "error"
+    return f"{r.width}×{r.height} {r.kind}" if r.width else (r.kind or '')
+
+_TEXT: List[Optional[Callable[[DownloadItem], str]]] = [
+    lambda it: os.path.basename(it.dest),
+    lambda it: it.status,
+    _progress_text,
+    _size_text,
+    None,
+    _speed_text,
+    _ttfb_text,
+    lambda it: it.url,
+]
+
+_SORT_KEY: List[Optional[Callable[[DownloadItem], object]]] = [
+    lambda it: os.path.basename(it.dest).lower(),
+    lambda it: STATUSES.index(it.status) if it.status in STATUSES else len(STATUSES),
+    lambda it: it.progress,
+    lambda it: it.size_bytes or 0,
+    None,
+    lambda it: it.rate,
+    lambda it: it.ttfb if it.ttfb is not None else float('inf'),
+    lambda it: it.url,
+]
+
+class DownloadListModel:
+    """Rows for the virtual downloads list, with an item id → row index.
+
+    `items` holds every download in insertion order; `rows` is the filtered,
+    sorted view the list control displays. An item entering or leaving the
+    filter is inserted (by binary search) or deleted in place. Each such move
+    shifts later rows by one, so the id → row index is allowed to drift by up
+    to `_drift` positions and is corrected on lookup; it is rebuilt in full
+    only after MAX_DRIFT moves.
+    """
+
+    def __init__(self):
+        self.items: List[DownloadItem] = []
+        self.rows: List[DownloadItem] = []
+        self._row_of: Dict[int, int] = {}   # keys: exactly the visible ids; values: row ± _drift
+        self._drift = 0
+        self._order: Dict[int, int] = {}   # item id → index in items, the unsorted row order
+        self.post: Dict[int, PostResult] = {}   # item id → post-processing result
+        self.status_filter: Optional[str] = None
+        self.sort_col: Optional[int] = None
+        self.ascending = True
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, item: DownloadItem) -> Optional[int]:
+        self._order[item.id] = len(self.items)
+        self.items.append(item)
+        if not self._visible(item):
+            return None
+        # New rows go to the end even when sorted; re-sorting is an explicit action
+        self._row_of[item.id] = len(self.rows)
+        self.rows.append(item)
+        return len(self.rows) - 1
+
+    def row_of(self, item: DownloadItem) -> Optional[int]:
+        row = self._row_of.get(item.id)
+        if row is None or not self._drift:
+            return row
+        rows = self.rows
+        for r in range(max(0, row - self._drift), min(len(rows), row + self._drift + 1)):
+            if rows[r] is item:
+                self._row_of[item.id] = r
+                return r
+        raise LookupError(f"download {item.id} lost from the view index")
+
+    def item_at(self, row: int) -> DownloadItem:
+        return self.rows[row]
+
+    def text(self, row: int, col: int) -> str:
+        it = self.rows[row]
+        return _image_text(it, self.post.get(it.id)) if col == IMAGE_COL else _TEXT[col](it)
+
+    def update(self, item: DownloadItem) -> bool:
+        """Return True when the item moved in or out of the filtered view."""
+        if self._visible(item) == (item.id in self._row_of):
+            return False
+        if item.id in self._row_of:
+            del self.rows[self.row_of(item)]
+            del self._row_of[item.id]
+        else:
+            key = self._row_key()
+            row = self._insert_pos(key(item), key)
+            self.rows.insert(row, item)
+            self._row_of[item.id] = row
+        self._drift += 1
+        if self._drift > MAX_DRIFT:
+            self._reindex()
+        return True
+
+    def set_filter(self, status: Optional[str]) -> None:
+        self.status_filter = status or None
+        self._rebuild()
+
+    def sort(self, col: int, ascending: Optional[bool] = None) -> None:
+        if ascending is None:
+            ascending = not self.ascending if col == self.sort_col else True
+        self.sort_col, self.ascending = col, ascending
+        self._rebuild()
+
+    def _pixels(self, item: DownloadItem) -> int:
+        r = self.post.get(item.id)
+        return (r.width or 0) * (r.height or 0) if r else -1
+
+    def _row_key(self) -> Callable[[DownloadItem], object]:
+        if self.sort_col is None:
+            return lambda it: self._order[it.id]
+        return _SORT_KEY[self.sort_col] or self._pixels
+
+    def _insert_pos(self, k, key) -> int:
+        # After equal keys; values that changed since the last sort only make the position approximate
+        rows, lo, hi = self.rows, 0, len(self.rows)
+        descending = self.sort_col is not None and not self.ascending
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (k > key(rows[mid])) if descending else (k < key(rows[mid])):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _visible(self, item: DownloadItem) -> bool:
+        return self.status_filter is None or item.status == self.status_filter
+
+    def _rebuild(self) -> None:
+        rows = [it for it in self.items if self._visible(it)]
+        if self.sort_col is not None:
+            rows.sort(key=self._row_key(), reverse=not self.ascending)
+        self.rows = rows
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._row_of = {it.id: i for i, it in enumerate(self.rows)}
+        self._drift = 0
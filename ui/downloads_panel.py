@@ -1,14 +1,50 @@
 
 import os, sys, wx
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
+from core.paths import data_dir
+from services.download_index import DownloadIndex
 from services.downloader import Downloader, DownloadItem
+from services.journal import DownloadJournal, JOURNAL_NAME
+from services.postprocess import PostProcessor, PostResult, THUMB_SIZE
+from services.progress import ProgressBus, FLUSH_HZ
+from ui.download_model import DownloadListModel, COLUMNS, STATUSES
+
+class DownloadListCtrl(wx.ListCtrl):
+    """Virtual report list: rows are pulled from the model only when painted."""
+
+    def __init__(self, parent, model: DownloadListModel):
+        super().__init__(parent, style=wx.LC_REPORT|wx.LC_VIRTUAL|wx.BORDER_SUNKEN)
+        self.model = model
+        self.thumb_slots: Dict[int, int] = {}   # item id → image list slot
+        for i,(t,w) in enumerate(COLUMNS):
+            self.InsertColumn(i,t,width=w)
+
+    def OnGetItemText(self, item, column):
+        return self.model.text(item, column)
+
+    def OnGetItemImage(self, item):
+        return self.thumb_slots.get(self.model.item_at(item).id, -1)
+
+    def sync(self):
+        self.SetItemCount(len(self.model))
+        self.Refresh()
 
 class DownloadsPanel(wx.Panel):
-    def __init__(self, parent, theme_getter):
+    def __init__(self, parent, theme_getter, on_summary: Optional[Callable[[str], None]] = None):
         super().__init__(parent)
         self._get_theme = theme_getter
-        self.items: List[DownloadItem] = []
-        self.downloader = Downloader(on_update=lambda it: wx.CallAfter(self._refresh_item, it))
+        self._on_summary = on_summary
+        self.model = DownloadListModel()
+        self.items: List[DownloadItem] = self.model.items
+        # Status changes reach the list at once; progress ticks are coalesced and flushed by a timer
+        self._bus = ProgressBus(on_status=self._on_status)
+        self.journal = DownloadJournal(os.path.join(data_dir(), JOURNAL_NAME))
+        self.downloader = Downloader(on_update=self._bus.post,
+                                     index=DownloadIndex(os.path.join(data_dir(), "downloads.sqlite3")))
+        self._flush_timer = wx.Timer(self)
+        self._post_sent: Dict[int, DownloadItem] = {}   # done items handed to post-processing
+        self._by_dest: Dict[str, DownloadItem] = {}     # newest item per destination file
+        self.Bind(wx.EVT_TIMER, self._on_flush, self._flush_timer)
 
         header = wx.BoxSizer(wx.HORIZONTAL)
         self.url_box = wx.TextCtrl(self, style=wx.TE_PROCESS_ENTER)
@@ -18,49 +54,186 @@ class DownloadsPanel(wx.Panel):
         header.Add(self.btn_add, 0, wx.ALL, 4)
         header.Add(self.btn_scan, 0, wx.ALL, 4)
 
-        self.list = wx.ListCtrl(self, style=wx.LC_REPORT|wx.BORDER_SUNKEN)
-        for i,(t,w) in enumerate([("File",240),("Status",100),("Progress",90),("Size",90),("From",260)]):
-            self.list.InsertColumn(i,t,width=w)
+        self.list = DownloadListCtrl(self, self.model)
+        self._thumbs = wx.ImageList(*THUMB_SIZE)
+        self._thumb_slot: Dict[str, int] = {}   # thumbnail file → slot, shared by identical files
+        self.list.SetImageList(self._thumbs, wx.IMAGE_LIST_SMALL)
+        # Hashing, decode checks and thumbnails run in worker processes, results come back via CallAfter
+        self.post = PostProcessor(on_done=lambda key, r: wx.CallAfter(self._on_post, key, r),
+                                  thumb_dir=data_dir("thumbnails"))
 
         ctrls = wx.BoxSizer(wx.HORIZONTAL)
         self.btn_start = wx.Button(self, label="Start")
+        self.btn_pause = wx.Button(self, label="Pause")
+        self.btn_cancel = wx.Button(self, label="Cancel")
         self.btn_open = wx.Button(self, label="Open Folder")
+        self.btn_metrics = wx.Button(self, label="Export Metrics…")
+        self.filter = wx.Choice(self, choices=["All"] + [st.capitalize() for st in STATUSES])
+        self.filter.SetSelection(0)
         ctrls.Add(self.btn_start, 0, wx.ALL, 4)
+        ctrls.Add(self.btn_pause, 0, wx.ALL, 4)
+        ctrls.Add(self.btn_cancel, 0, wx.ALL, 4)
         ctrls.Add(self.btn_open, 0, wx.ALL, 4)
+        ctrls.Add(self.filter, 0, wx.ALL, 4)
+        ctrls.Add(self.btn_metrics, 0, wx.ALL, 4)
+        self.rate_limit = wx.SpinCtrl(self, min=0, max=1_000_000, initial=0, size=wx.Size(90, -1))
+        self.rate_limit.SetToolTip("Total download bandwidth in KB/s, 0 for unlimited")
+        ctrls.Add(wx.StaticText(self, label="Max KB/s"), 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 4)
+        ctrls.Add(self.rate_limit, 0, wx.ALL, 4)
+        self.summary = wx.StaticText(self, label="")
 
         s = wx.BoxSizer(wx.VERTICAL)
         s.Add(header, 0, wx.EXPAND)
         s.Add(self.list, 1, wx.EXPAND|wx.LEFT|wx.RIGHT|wx.BOTTOM, 4)
         s.Add(ctrls, 0)
+        s.Add(self.summary, 0, wx.EXPAND|wx.ALL, 4)
         self.SetSizer(s)
 
         self.url_box.Bind(wx.EVT_TEXT_ENTER, self._on_add)
         self.btn_add.Bind(wx.EVT_BUTTON, self._on_add)
         self.btn_start.Bind(wx.EVT_BUTTON, self._on_start)
+        self.btn_pause.Bind(wx.EVT_BUTTON, self._on_pause)
+        self.btn_cancel.Bind(wx.EVT_BUTTON, self._on_cancel)
         self.btn_open.Bind(wx.EVT_BUTTON, self._on_open)
+        self.btn_metrics.Bind(wx.EVT_BUTTON, self._on_export_metrics)
+        self.filter.Bind(wx.EVT_CHOICE, self._on_filter)
+        self.list.Bind(wx.EVT_LIST_COL_CLICK, self._on_sort)
+        self.list.Bind(wx.EVT_CONTEXT_MENU, self._on_context_menu)
+        self.rate_limit.Bind(wx.EVT_SPINCTRL, self._on_rate_limit)
         self.btn_scan.Bind(wx.EVT_BUTTON, lambda _e: wx.MessageBox("Hook to BrowserTab.start_hover_pick + image scan", "TODO"))
+        self._restore()
+
+    def _restore(self):
+        """Bring back the queue from the journal; transfers cut off by the last exit resume."""
+        items, resumed = self.journal.restore()
+        for it in items:
+            self.downloader.reserve(it.url, it.dest)
+            self._by_dest[it.dest] = it
+            self.model.add(it)
+            if it.status == "done" and os.path.exists(it.dest):
+                self._post_process(it)   # thumbnails are cached on disk, so this is cheap after the first run
+        self.list.SetItemCount(len(self.model))
+        for it in resumed:
+            self.downloader.start(it)
+        if resumed:
+            self._flush_timer.Start(1000 // FLUSH_HZ)
+
+    def _on_status(self, it: DownloadItem):
+        # Posting thread: journal the transition before the UI hears of it
+        self.journal.update(it)
+        wx.CallAfter(self._refresh_item, it)
 
     def apply_theme(self):
         t = self._get_theme()
-        for w in (self, self.list, self.url_box, self.btn_add, self.btn_scan, self.btn_start, self.btn_open):
+        for w in (self, self.list, self.url_box, self.btn_add, self.btn_scan, self.btn_start, self.btn_pause, self.btn_cancel, self.btn_open, self.btn_metrics, self.filter, self.rate_limit):
             w.SetBackgroundColour(t.ctrl_bg if w is not self else t.bg)
             w.SetForegroundColour(t.ctrl_fg)
 
     def add_download(self, url: str, dest_dir: Optional[str]=None):
         if not url: return
         dest_dir = dest_dir or os.path.join(os.getcwd(), 'downloads'); os.makedirs(dest_dir, exist_ok=True)
-        name = os.path.basename(url.split('?')[0]) or 'download.bin'
-        item = DownloadItem(url=url, dest=os.path.join(dest_dir, name))
-        self.items.append(item)
-        idx = self.list.InsertItem(self.list.GetItemCount(), name)
-        self.list.SetItem(idx,1,item.status); self.list.SetItem(idx,2,f"{item.progress}%"); self.list.SetItem(idx,3,'?'); self.list.SetItem(idx,4,item.url)
+        dest = self.downloader.destination(url, dest_dir)
+        listed = self._by_dest.get(dest)
+        if listed is not None and listed.status != "done":
+            return  # already in the list and not finished: one item per file
+        item = self._by_dest[dest] = DownloadItem(url=url, dest=dest)
+        self.journal.add(item)
+        if self.model.add(item) is not None:
+            self.list.SetItemCount(len(self.model))
 
     def _on_add(self, _): self.add_download(self.url_box.GetValue().strip()); self.url_box.SetValue("")
 
+    def _selected(self) -> List[DownloadItem]:
+        rows, row = [], self.list.GetFirstSelected()
+        while row != -1:
+            rows.append(self.model.item_at(row)); row = self.list.GetNextSelected(row)
+        return rows
+
     def _on_start(self, _):
-        for it in self.items:
-            if it.status in ('queued','error','canceled'):
+        # Start the selection, or everything startable when nothing is selected
+        for it in self._selected() or self.items:
+            if it.status in ('queued','paused','error','canceled'):
                 self.downloader.start(it)
+        if not self._flush_timer.IsRunning():
+            self._flush_timer.Start(1000 // FLUSH_HZ)
+
+    def _on_flush(self, _evt):
+        for it in self._bus.drain():
+            self._refresh_item(it)
+        self._show_summary()
+        if not (self.downloader.active_count or self.downloader.pending_count):
+            self._flush_timer.Stop()
+
+    def _show_summary(self):
+        text = self.downloader.metrics.summary()
+        if text != self.summary.GetLabel():
+            self.summary.SetLabel(text)
+            if self._on_summary: self._on_summary(text)
+
+    def _on_export_metrics(self, _):
+        with wx.FileDialog(self, "Export download metrics", defaultFile="pyweb-metrics.json",
+                           wildcard="JSON (*.json)|*.json|Prometheus text (*.prom)|*.prom",
+                           style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT) as dlg:
+            if dlg.ShowModal() != wx.ID_OK: return
+            path = dlg.GetPath()
+        try:
+            self.downloader.metrics.dump(path)
+        except OSError as e:
+            wx.MessageBox(str(e), "Export Metrics", wx.OK|wx.ICON_ERROR, self)
+
+    def _on_pause(self, _):
+        for it in self._selected() or self.items:
+            self.downloader.pause(it)
+
+    def _on_cancel(self, _):
+        for it in self._selected():
+            self.downloader.cancel(it)
+
+    def _on_rate_limit(self, _evt):
+        self.downloader.set_rate_limit(self.rate_limit.GetValue() * 1024)
+
+    def _on_context_menu(self, _evt):
+        sel = self._selected()
+        if not sel: return
+        menu = wx.Menu()
+        first = menu.Append(wx.ID_ANY, "Download First")
+        limit = menu.Append(wx.ID_ANY, "Limit Speed…")
+        unlimit = menu.Append(wx.ID_ANY, "Remove Speed Limit")
+        unlimit.Enable(any(it.limit for it in sel))
+        self.Bind(wx.EVT_MENU, lambda _e: self._prioritize(sel), first)
+        self.Bind(wx.EVT_MENU, lambda _e: self._limit(sel), limit)
+        self.Bind(wx.EVT_MENU, lambda _e: self._set_limit(sel, None), unlimit)
+        self.PopupMenu(menu)
+        menu.Destroy()
+
+    def _prioritize(self, sel: List[DownloadItem]):
+        # Ahead of everything else, keeping the selection's own order
+        top = min(it.priority for it in self.items) - len(sel)
+        for i, it in enumerate(sel):
+            self.downloader.set_priority(it, top + i)
+            self.journal.update_priority(it)
+
+    def _limit(self, sel: List[DownloadItem]):
+        current = next((it.limit for it in sel if it.limit), 0) // 1024
+        with wx.NumberEntryDialog(self, "Maximum speed for the selected downloads (0 for unlimited)", "KB/s:",
+                                  "Limit Speed", current, 0, 1_000_000) as dlg:
+            if dlg.ShowModal() != wx.ID_OK: return
+            bps = dlg.GetValue() * 1024
+        self._set_limit(sel, bps)
+
+    def _set_limit(self, sel: List[DownloadItem], bps: Optional[int]):
+        for it in sel:
+            self.downloader.set_item_limit(it, bps)
+            self.journal.update_priority(it)
+
+    def _on_filter(self, _evt):
+        sel = self.filter.GetSelection()
+        self.model.set_filter(STATUSES[sel-1] if sel > 0 else None)
+        self.list.sync()
+
+    def _on_sort(self, evt):
+        self.model.sort(evt.GetColumn())
+        self.list.sync()
 
     def _on_open(self, _):
         if not self.items: return
@@ -69,10 +242,44 @@ class DownloadsPanel(wx.Panel):
         elif sys.platform=='darwin': os.system(f"open '{folder}'")
         else: os.system(f"xdg-open '{folder}'")
 
+    def close(self):
+        self.journal.close()
+        self.post.close()
+
+    def _on_post(self, item_id: int, r: PostResult):
+        it = self._post_sent.get(item_id)
+        if it is None or it.status != "done" or it.dest != r.path:
+            return  # restarted or moved since: a fresh result will follow
+        self.model.post[item_id] = r
+        if r.thumbnail:
+            slot = self._thumb_slot.get(r.thumbnail)
+            if slot is None:
+                img = wx.Image(r.thumbnail, wx.BITMAP_TYPE_PNG)
+                if img.IsOk():
+                    slot = self._thumb_slot[r.thumbnail] = self._thumbs.Add(wx.Bitmap(img))
+            if slot is not None:
+                self.list.thumb_slots[item_id] = slot
+        row = self.model.row_of(it)
+        if row is not None:
+            self.list.RefreshItem(row)
+
+    def _post_process(self, it: DownloadItem):
+        if it.id in self._post_sent:
+            return
+        self._post_sent[it.id] = it
+        entry = self.downloader.index.lookup(it.url) if self.downloader.index else None
+        self.post.submit(it.id, it.dest, entry.sha256 if entry and entry.path == it.dest else None)
+
     def _refresh_item(self, it: DownloadItem):
-        for row in range(self.list.GetItemCount()):
-            if self.list.GetItemText(row) == os.path.basename(it.dest):
-                self.list.SetItem(row,1,it.status)
-                self.list.SetItem(row,2,f"{it.progress}%")
-                self.list.SetItem(row,3, f"{(it.size_bytes or 0)/1024:.0f} KB" if it.size_bytes else '?')
-                break
+        if it.status == "done":
+            self._post_process(it)
+        elif it.id in self._post_sent:
+            del self._post_sent[it.id]
+            self.model.post.pop(it.id, None)
+            self.list.thumb_slots.pop(it.id, None)
+        if self.model.update(it):
+            self.list.sync()
+            return
+        row = self.model.row_of(it)
+        if row is not None:
+            self.list.RefreshItem(row)
@@ -1,5 +1,6 @@
-
 import os, wx
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 try:
     import wx.svg as wxsvg  # wxPython >= 4.1
 except Exception:
@@ -7,20 +8,83 @@ except Exception:
 
 ICON_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "resources", "icons"))
 
+TOOLBAR_ICONS = ("back.svg", "forward.svg", "reload.svg", "stop.svg", "go.svg",
+                 "newtab.svg", "downloads.svg", "history.svg")
+
+_Key = Tuple[str, Tuple[int, int], str, float]
+
 class Iconset:
-    def __init__(self, theme_fg: wx.Colour):
+    """Rasterizes icons tinted with the theme foreground and caches the bitmaps.
+
+    Bitmaps are keyed by (name, size, colour, scale) in an LRU of
+    `max_entries`; SVG sources are read from disk once. `image_index` hands
+    out one slot per key in a given wx.ImageList instead of appending a copy
+    per caller.
+    """
+
+    def __init__(self, theme_fg: wx.Colour, scale: float = 1.0, max_entries: int = 128):
+        self.fg = theme_fg
+        self.scale = scale
+        self.max_entries = max_entries
+        self._bitmaps: "OrderedDict[_Key, wx.Bitmap]" = OrderedDict()
+        self._sources: Dict[str, Optional[bytes]] = {}
+        self._slots: Dict[Tuple[int, _Key], int] = {}
+
+    def set_theme(self, theme_fg: wx.Colour, scale: Optional[float] = None) -> None:
         self.fg = theme_fg
+        if scale:
+            self.scale = scale
+
+    def precompute(self, names: Iterable[str] = TOOLBAR_ICONS, size=(20,20)) -> None:
+        for name in names:
+            self.bundle(name, size)
 
-    def load_svg(self, name: str, size=(20,20)) -> wx.Bitmap:
-        path = os.path.join(ICON_DIR, name)
-        if wxsvg and os.path.exists(path):
-            img = wxsvg.SVGimage.CreateFromFile(path)
-            bmp = img.ConvertToBitmap(width=size[0], height=size[1])
+    def load_svg(self, name: str, size=(20,20), scale: float = 1.0) -> wx.Bitmap:
+        key = (name, tuple(size), self.fg.GetAsString(wx.C2S_HTML_SYNTAX), scale)
+        bmp = self._bitmaps.get(key)
+        if bmp is not None:
+            self._bitmaps.move_to_end(key)
             return bmp
+        bmp = self._rasterize(name, (round(size[0]*scale), round(size[1]*scale)))
+        self._bitmaps[key] = bmp
+        while len(self._bitmaps) > self.max_entries:
+            self._bitmaps.popitem(last=False)
+        return bmp
+
+    def bundle(self, name: str, size=(20,20)) -> wx.BitmapBundle:
+        bmp = self.load_svg(name, size)
+        if self.scale == 1.0:
+            return wx.BitmapBundle.FromBitmap(bmp)
+        return wx.BitmapBundle.FromBitmaps([bmp, self.load_svg(name, size, self.scale)])
+
+    def image_index(self, images: wx.ImageList, name: str, size=(16,16)) -> int:
+        key = (name, tuple(size), self.fg.GetAsString(wx.C2S_HTML_SYNTAX), 1.0)
+        slot = self._slots.get((id(images), key))
+        if slot is None:
+            slot = self._slots[(id(images), key)] = images.Add(self.load_svg(name, size))
+        return slot
+
+    def _source(self, name: str) -> Optional[bytes]:
+        if name not in self._sources:
+            path = os.path.join(ICON_DIR, name)
+            try:
+                with open(path, 'rb') as f:
+                    self._sources[name] = f.read()
+            except OSError:
+                self._sources[name] = None
+        return self._sources[name]
+
+    def _rasterize(self, name: str, px) -> wx.Bitmap:
+        src = self._source(name) if wxsvg else None
+        if src is not None:
+            # Icons are drawn with currentColor; bake in the theme foreground
+            colour = self.fg.GetAsString(wx.C2S_HTML_SYNTAX).encode('ascii')
+            img = wxsvg.SVGimage.CreateFromBytes(src.replace(b'currentColor', colour))
+            return img.ConvertToBitmap(width=px[0], height=px[1])
         # fallback to PNG if present
-        png_path = path.replace('.svg', '.png')
+        png_path = os.path.join(ICON_DIR, name).replace('.svg', '.png')
         if os.path.exists(png_path):
             img = wx.Image(png_path)
-            img = img.Rescale(size[0], size[1], wx.IMAGE_QUALITY_HIGH)
+            img = img.Rescale(px[0], px[1], wx.IMAGE_QUALITY_HIGH)
             return wx.Bitmap(img)
-        return wx.Bitmap(width=size[0], height=size[1])
+        return wx.Bitmap(width=px[0], height=px[1])
@@ -0,0 +1,129 @@
+import wx
+from typing import Dict, List, Optional
+
+from services.probe import ImageMeta, MetadataProbe
+
+TYPES = ["All types", "jpeg", "png", "gif", "webp", "Other"]
+REFRESH_MS = 250
+
+def _describe(url: str, meta: Optional[ImageMeta]) -> str:
+    if meta is None:
+        return f"…  {url}"
+    if meta.error:
+        return f"error  {url}"
+    dims = f"{meta.width}×{meta.height}" if meta.width else "?×?"
+    size = f"{meta.size/1024:.0f} KB" if meta.size is not None else "? KB"
+    return f"{dims}  {meta.kind or '?'}  {size}  {url}"
+
+class ImagePickerDialog(wx.Dialog):
+    """Lets the user pick image URLs while their size, type and dimensions are probed in the background."""
+
+    def __init__(self, parent: wx.Window, urls: List[str], probe: MetadataProbe):
+        super().__init__(parent, title="Images", size=wx.Size(760, 520), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.urls = urls
+        self.meta: Dict[str, ImageMeta] = {}
+        self.checked: Dict[str, bool] = {}
+        self._shown: List[str] = []
+        self._dirty = True
+
+        filters = wx.BoxSizer(wx.HORIZONTAL)
+        self.min_kb = wx.SpinCtrl(self, min=0, max=100_000, initial=0)
+        self.min_px = wx.SpinCtrl(self, min=0, max=20_000, initial=0)
+        self.kind = wx.Choice(self, choices=TYPES)
+        self.kind.SetSelection(0)
+        for label, ctrl in (("Min KB", self.min_kb), ("Min px", self.min_px), ("Type", self.kind)):
+            filters.Add(wx.StaticText(self, label=label), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 4)
+            filters.Add(ctrl, 0, wx.ALL, 4)
+        self.status = wx.StaticText(self)
+        filters.Add(self.status, 1, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 4)
+
+        self.list = wx.CheckListBox(self)
+        picks = wx.BoxSizer(wx.HORIZONTAL)
+        self.btn_all = wx.Button(self, label="Select shown")
+        self.btn_none = wx.Button(self, label="Select none")
+        picks.Add(self.btn_all, 0, wx.ALL, 4)
+        picks.Add(self.btn_none, 0, wx.ALL, 4)
+        picks.AddStretchSpacer()
+        picks.Add(self.CreateButtonSizer(wx.OK | wx.CANCEL), 0, wx.ALL, 4)
+
+        s = wx.BoxSizer(wx.VERTICAL)
+        s.Add(filters, 0, wx.EXPAND)
+        s.Add(self.list, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 4)
+        s.Add(picks, 0, wx.EXPAND)
+        self.SetSizer(s)
+
+        for ctrl in (self.min_kb, self.min_px):
+            ctrl.Bind(wx.EVT_SPINCTRL, self._on_filter)
+        self.kind.Bind(wx.EVT_CHOICE, self._on_filter)
+        self.list.Bind(wx.EVT_CHECKLISTBOX, self._on_check)
+        self.btn_all.Bind(wx.EVT_BUTTON, lambda _e: self._check_shown(True))
+        self.btn_none.Bind(wx.EVT_BUTTON, lambda _e: self._check_shown(False))
+
+        # Results arrive on probe threads; the timer folds them into the list a few times a second
+        self._timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda _e: self._refresh(), self._timer)
+        self._timer.Start(REFRESH_MS)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self._on_destroy)
+        self._probes = probe.submit(urls, self._on_meta)
+        self._refresh()
+
+    def GetSelectedUrls(self) -> List[str]:
+        return [u for u in self._shown if self.checked.get(u)]
+
+    def _on_meta(self, meta: ImageMeta) -> None:
+        # Called from probe worker threads: plain dict stores only, no wx calls
+        self.meta[meta.url] = meta
+        self._dirty = True
+
+    def _on_destroy(self, evt) -> None:
+        if evt.GetEventObject() is self:
+            self._timer.Stop()
+            for fut in self._probes:   # a page with thousands of images would otherwise keep probing after close
+                fut.cancel()
+        evt.Skip()
+
+    def _passes(self, url: str) -> bool:
+        meta = self.meta.get(url)
+        min_kb, min_px, kind = self.min_kb.GetValue(), self.min_px.GetValue(), self.kind.GetSelection()
+        if meta is None or meta.error:
+            # Unknown yet: only shown while no filter is active
+            return not (min_kb or min_px or kind)
+        if min_kb and (meta.size is None or meta.size < min_kb * 1024):
+            return False
+        if min_px and (meta.width is None or min(meta.width, meta.height) < min_px):
+            return False
+        if kind:
+            k = meta.kind
+            return k not in TYPES[1:-1] if TYPES[kind] == "Other" else k == TYPES[kind]
+        return True
+
+    def _refresh(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        shown = [u for u in self.urls if self._passes(u)]
+        labels = [_describe(u, self.meta.get(u)) for u in shown]
+        if shown == self._shown:
+            for i, label in enumerate(labels):
+                if self.list.GetString(i) != label:
+                    self.list.SetString(i, label)
+        else:
+            self._shown = shown
+            self.list.Set(labels)
+            self.list.SetCheckedItems([i for i, u in enumerate(shown) if self.checked.get(u)])
+        self.status.SetLabel(f"{len(self.meta)}/{len(self.urls)} probed, {len(shown)} shown")
+        if len(self.meta) >= len(self.urls):
+            self._timer.Stop()
+
+    def _on_filter(self, _evt) -> None:
+        self._dirty = True
+        self._refresh()
+
+    def _on_check(self, evt: wx.CommandEvent) -> None:
+        i = evt.GetInt()
+        self.checked[self._shown[i]] = self.list.IsChecked(i)
+
+    def _check_shown(self, on: bool) -> None:
+        for u in self._shown:
+            self.checked[u] = on
+        self.list.SetCheckedItems(list(range(len(self._shown))) if on else [])
@@ -1,50 +1,108 @@
+import hashlib
+import io
 import os
-import tempfile
-import urllib.request
+import threading
+import time
 import wx
-from typing import Optional, Deque, Tuple, List
-from collections import deque
+from typing import Optional, Dict, Tuple, List
 
+from core.paths import data_dir
 from core.theme import Theme, LIGHT, DARK
+from core.timing import startup
 from ui.browser_tab import BrowserTab
-from ui.downloads_panel import DownloadsPanel
-from ui.icons import Iconset
-from services import dom_select
+from ui.icons import Iconset, TOOLBAR_ICONS
+from services.history import HistoryStore
+from services.perf import PERF_TYPE
+from services.webmsg import MessageChannel
+# The downloads and profiler sidebars, image picker, metadata probe and favicon cache are
+# imported and built on first use, keeping them off the cold-start path
 
 START_URL = "https://example.com"
 ICON_SIZE = (20, 20)
 TAB_ICON_SIZE = (16, 16)
-HISTORY_MAX = 50
+HISTORY_MENU_ITEMS = 15
+SUGGESTIONS = 8
+HIBERNATE_AFTER = 10 * 60   # seconds a background tab may sit unselected before its WebView is dropped
+MAX_LIVE_TABS = 12          # live WebViews kept at most, the least recently used are hibernated first
+HIBERNATE_CHECK_MS = 30_000
+CANDIDATE_SETTLE_MS = 400   # prompt once image candidate batches stop arriving for this long
+
+
+def _decode_favicon(data: bytes) -> Optional[Tuple[str, wx.Image]]:
+    # Runs on a favicon worker thread: wx.Image is safe there, wx.Bitmap is not
+    stream = io.BytesIO(data)
+    if not wx.Image.CanRead(stream):
+        return None
+    img = wx.Image(stream, wx.BITMAP_TYPE_ANY)
+    if not img.IsOk():
+        return None
+    img = img.Scale(TAB_ICON_SIZE[0], TAB_ICON_SIZE[1], wx.IMAGE_QUALITY_HIGH)
+    return hashlib.sha1(data).hexdigest(), img
+
+
+class HistoryCompleter(wx.TextCompleter):
+    """Feeds address-bar autocomplete from the history store as the user types."""
+
+    def __init__(self, store: HistoryStore) -> None:
+        super().__init__()
+        self.store = store
+        self._matches: List[str] = []
+
+    def Start(self, prefix: str) -> bool:
+        self._matches = [url for _title, url in self.store.suggest(prefix, SUGGESTIONS)]
+        return bool(self._matches)
+
+    def GetNext(self) -> str:
+        return self._matches.pop(0) if self._matches else ""
 
 
 class BrowserFrame(wx.Frame):
     def __init__(self) -> None:
         super().__init__(None, title="PyWeb MiniBrowser", size=wx.Size(1100, 750))
         self._theme: Theme = DARK
-        self.iconset = Iconset(self._theme.fg)
-        self.history: Deque[Tuple[str, str]] = deque(maxlen=HISTORY_MAX)
+        self.iconset = Iconset(self._theme.fg, scale=self.GetContentScaleFactor())
+        self.history: Optional[HistoryStore] = None   # opened after the first paint
 
-        # Splitter: left (browser) | right (downloads sidebar)
+        # Splitter: left (browser) | right (downloads or profiler sidebar, each created on first use)
         self.splitter = wx.SplitterWindow(self, style=wx.SP_LIVE_UPDATE)
         self.left = wx.Panel(self.splitter)
-        self.right = DownloadsPanel(self.splitter, theme_getter=lambda: self._theme)
-        self.splitter.SplitVertically(self.left, self.right, sashPosition=self.GetSize().width - 320)
-        self.splitter.Unsplit(self.right)
+        self.right = None
+        self.profiler = None
+        self.splitter.Initialize(self.left)
         self.splitter.SetSashGravity(1.0)
 
         # Tabs + images
         self._tab_images = wx.ImageList(TAB_ICON_SIZE[0], TAB_ICON_SIZE[1])
         self.nb = wx.Notebook(self.left)
         self.nb.AssignImageList(self._tab_images)
+        self.hibernate_after = HIBERNATE_AFTER
+        self.max_live_tabs = MAX_LIVE_TABS
+        self._hibernate_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda _e: self._hibernate_idle_tabs(), self._hibernate_timer)
+        self._hibernate_timer.Start(HIBERNATE_CHECK_MS)
+        self._favicon_slots: Dict[str, int] = {}
+        # Streamed image candidates per tab: not yet offered, and every URL seen so far
+        self._candidates: Dict[BrowserTab, Dict[str, None]] = {}
+        self._candidates_seen: Dict[BrowserTab, set] = {}
+        self._candidate_timer: Optional[wx.CallLater] = None
+        self._prompting = False
+        self.probe = None
+        self.favicons = None
+        self.channel = MessageChannel()
+        self.channel.register("pyweb/elementPicked", self._on_element_picked)
+        self.channel.register("pyweb/imageCandidates", self._on_image_candidates)
+        self.channel.register("pyweb/favicon", self._on_favicon_href, low=True)   # only the newest icon matters
+        self.channel.register(PERF_TYPE, self._on_perf)
 
         # Toolbar
         chrome = wx.Panel(self.left)
 
+        self._icon_buttons: List[Tuple[wx.BitmapButton, str]] = []
+
         def mkbtn(name: str, tip: str) -> wx.BitmapButton:
-            bmp = self.iconset.load_svg(name, size=ICON_SIZE)
-            bundle = wx.BitmapBundle.FromBitmap(bmp)
-            btn = wx.BitmapButton(chrome, bitmap=bundle, style=wx.BU_AUTODRAW)
+            btn = wx.BitmapButton(chrome, bitmap=self.iconset.bundle(name, ICON_SIZE), style=wx.BU_AUTODRAW)
             btn.SetToolTip(tip)
+            self._icon_buttons.append((btn, name))
             return btn
 
         self.btn_back = mkbtn("back.svg", "Back")
@@ -69,7 +127,8 @@ class BrowserFrame(wx.Frame):
         left_sizer.Add(self.nb, 1, wx.EXPAND)
         self.left.SetSizer(left_sizer)
 
-        self.CreateStatusBar()
+        self.CreateStatusBar(2)
+        self.SetStatusWidths([-1, 380])
         self.SetStatusText("Ready")
 
         self.addr.Bind(wx.EVT_TEXT_ENTER, self._on_go)
@@ -82,25 +141,94 @@ class BrowserFrame(wx.Frame):
         self.btn_fwd.Bind(wx.EVT_BUTTON, self._on_forward)
         self.btn_reload.Bind(wx.EVT_BUTTON, self._on_reload)
         self.btn_stop.Bind(wx.EVT_BUTTON, self._on_stop)
+        self.nb.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self._on_tab_changed)
+        self.Bind(wx.EVT_CLOSE, self._on_close)
+        stats_id, profiler_id = wx.NewIdRef(), wx.NewIdRef()
+        self.Bind(wx.EVT_MENU, self._show_message_stats, id=stats_id)
+        self.Bind(wx.EVT_MENU, self._toggle_profiler, id=profiler_id)
+        self.SetAcceleratorTable(wx.AcceleratorTable([(wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('M'), stats_id),
+                                                      (wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('P'), profiler_id)]))
+        chrome.Bind(wx.EVT_PAINT, self._on_first_paint)
 
-        try:
-            self.right.btn_scan.Bind(wx.EVT_BUTTON, self._start_image_pick)
-        except Exception:
-            pass
-
-        self.new_tab(START_URL)
         self.apply_theme()
 
+    def _on_first_paint(self, evt: wx.PaintEvent) -> None:
+        evt.Skip()
+        evt.GetEventObject().Unbind(wx.EVT_PAINT, handler=self._on_first_paint)
+        startup.mark("first_paint")
+        wx.CallAfter(self._after_first_paint)
+
+    def _after_first_paint(self) -> None:
+        self.history = HistoryStore(os.path.join(data_dir(), "history.sqlite3"))
+        self.addr.AutoComplete(HistoryCompleter(self.history))
+        if not self.nb.GetPageCount():
+            self.new_tab(START_URL)
+        else:
+            startup.finish()
+        wx.CallAfter(self._restore_downloads)
+
+    def _restore_downloads(self) -> None:
+        # Transfers cut off by the last exit resume now, in the (still hidden) panel; a journal of
+        # finished items waits until the sidebar is opened. The journal is read off the UI thread.
+        from services.journal import JOURNAL_NAME, interrupted
+        path = os.path.join(data_dir(), JOURNAL_NAME)
+
+        def check():
+            if interrupted(path):
+                wx.CallAfter(lambda: self and self._downloads())
+        threading.Thread(target=check, name="pyweb-journal-check", daemon=True).start()
+
+    def _on_first_load(self, _tab: BrowserTab) -> None:
+        startup.mark("first_load")
+        startup.finish()
+
+    def _downloads(self):
+        if self.right is None:
+            from ui.downloads_panel import DownloadsPanel
+            self.right = DownloadsPanel(self.splitter, theme_getter=lambda: self._theme,
+                                        on_summary=lambda text: self.SetStatusText(text, 1))
+            self.right.btn_scan.Bind(wx.EVT_BUTTON, self._start_image_pick)
+            self.right.Hide()
+            self.apply_theme()
+        return self.right
+
+    def _profiler(self):
+        if self.profiler is None:
+            from ui.profiler_panel import ProfilerPanel
+            self.profiler = ProfilerPanel(self.splitter, theme_getter=lambda: self._theme)
+            self.profiler.Hide()
+            self.apply_theme()
+        return self.profiler
+
+    def _favicon_cache(self):
+        if self.favicons is None:
+            from services.favicons import FaviconCache
+            self.favicons = FaviconCache(data_dir("favicons"), decode=_decode_favicon,
+                                         on_ready=lambda _href, res, tab: wx.CallAfter(self._apply_favicon, tab, res))
+        return self.favicons
+
     def apply_theme(self) -> None:
         t = self._theme
-        for w in (self, self.left, self.splitter, self.addr, self.right):
+        for w in (self, self.left, self.splitter, self.addr, self.right, self.profiler):
+            if w is None: continue
             w.SetBackgroundColour(t.bg)
             w.SetForegroundColour(t.fg)
-        self.right.apply_theme()
+        for panel in (self.right, self.profiler):
+            if panel is not None:
+                panel.apply_theme()
         self.Refresh()
 
     def _toggle_theme(self, _evt=None) -> None:
         self._theme = LIGHT if self._theme.name == "dark" else DARK
+        old_generic = self._generic_tab_icon_index()
+        self.iconset.set_theme(self._theme.fg)
+        self.iconset.precompute(TOOLBAR_ICONS, ICON_SIZE)
+        for btn, name in self._icon_buttons:
+            btn.SetBitmap(self.iconset.bundle(name, ICON_SIZE))
+        new_generic = self._generic_tab_icon_index()
+        for i in range(self.nb.GetPageCount()):
+            if self.nb.GetPageImage(i) == old_generic:
+                self.nb.SetPageImage(i, new_generic)
         self.apply_theme()
 
     def _active(self) -> Optional[BrowserTab]:
@@ -108,17 +236,57 @@ class BrowserFrame(wx.Frame):
         return page if isinstance(page, BrowserTab) else None
 
     def _generic_tab_icon_index(self) -> int:
-        bmp = self.iconset.load_svg("newtab.svg", size=TAB_ICON_SIZE)
-        return self._tab_images.Add(bmp)
+        return self.iconset.image_index(self._tab_images, "newtab.svg", TAB_ICON_SIZE)
 
     def new_tab(self, url: str) -> None:
-        tab = BrowserTab(self.nb, on_title_changed=lambda _t, ttl: self.SetStatusText(ttl),
-                         on_new_window=self._open_in_new_tab, on_webmsg=self._on_webmsg)
+        first = not self.nb.GetPageCount() and startup.enabled
+        tab = BrowserTab(self.nb, on_title_changed=self._on_tab_title,
+                         on_new_window=self._open_in_new_tab, channel=self.channel,
+                         on_loaded=self._on_first_load if first else None)
+        tab.profiling = self._profiling()
         idx_img = self._generic_tab_icon_index()
         self.nb.AddPage(tab, "", select=True, imageId=idx_img)
         tab.load(url)
         self.addr.ChangeValue(url)
         self._push_history(url, url)
+        self._hibernate_idle_tabs()
+
+    def _on_tab_title(self, tab: BrowserTab, title: str) -> None:
+        self.SetStatusText(title)
+        if tab.view and self.history:
+            self.history.set_title(tab.view.GetCurrentURL(), title)
+
+    def _on_close(self, evt: wx.CloseEvent) -> None:
+        startup.finish()   # no-op unless timing is on and the first load never finished
+        for res in (self.history, self.favicons, self.probe, self.right):
+            if res is not None:
+                res.close()
+        evt.Skip()
+
+    def _on_tab_changed(self, evt: wx.BookCtrlEvent) -> None:
+        now = time.monotonic()
+        old, new = evt.GetOldSelection(), evt.GetSelection()
+        if old != wx.NOT_FOUND and old < self.nb.GetPageCount():
+            self.nb.GetPage(old).last_active = now
+        if new != wx.NOT_FOUND:
+            tab = self.nb.GetPage(new)
+            tab.last_active = now
+            tab.wake()
+            if self.profiler is not None:
+                self.profiler.show(tab)
+        evt.Skip()
+
+    def _hibernate_idle_tabs(self) -> None:
+        """Hibernate background tabs idle past `hibernate_after`, then the oldest beyond `max_live_tabs`."""
+        current = self.nb.GetCurrentPage()
+        live = [self.nb.GetPage(i) for i in range(self.nb.GetPageCount())]
+        live = [t for t in live if isinstance(t, BrowserTab) and not t.hibernated and t is not current]
+        live.sort(key=lambda t: t.last_active)
+        now = time.monotonic()
+        budget = max(0, self.max_live_tabs - (1 if current is not None else 0))
+        for i, tab in enumerate(live):
+            if now - tab.last_active >= self.hibernate_after or len(live) - i > budget:
+                tab.hibernate()
 
     def _open_in_new_tab(self, url: str) -> None:
         self.new_tab(url)
@@ -134,41 +302,63 @@ class BrowserFrame(wx.Frame):
 
     def _on_back(self, _evt): 
         a = self._active()
-        if a and hasattr(a, "view") and a.view.CanGoBack():
+        if a and a.view and a.view.CanGoBack():
             a.view.GoBack()
 
     def _on_forward(self, _evt):
         a = self._active()
-        if a and hasattr(a, "view") and a.view.CanGoForward():
+        if a and a.view and a.view.CanGoForward():
             a.view.GoForward()
 
     def _on_reload(self, _evt):
         a = self._active()
-        if a and hasattr(a, "view"):
+        if a and a.view:
             a.view.Reload()
 
     def _on_stop(self, _evt):
         a = self._active()
-        if a and hasattr(a, "view"):
+        if a and a.view:
             a.view.Stop()
 
     def _toggle_downloads(self, _evt=None) -> None:
-        if self.splitter.IsSplit():
-            self.splitter.Unsplit(self.right)
+        self._toggle_sidebar(self._downloads())
+
+    def _toggle_profiler(self, _evt=None) -> None:
+        self._profiler().show(self._active())
+        self._toggle_sidebar(self.profiler)
+
+    def _toggle_sidebar(self, panel: wx.Window) -> None:
+        """Show `panel` on the right, replacing the other sidebar, or close it when it is already showing."""
+        shown = self.splitter.GetWindow2() if self.splitter.IsSplit() else None
+        if shown is panel:
+            self.splitter.Unsplit(panel)
+        elif shown is not None:
+            self.splitter.ReplaceWindow(shown, panel)
+            shown.Hide(); panel.Show()
         else:
-            self.splitter.SplitVertically(self.left, self.right, sashPosition=self.GetSize().width - 320)
+            self.splitter.SplitVertically(self.left, panel, sashPosition=self.GetSize().width - 320)
+        # Pages are profiled only while the profiler is on screen
+        on = self._profiling()
+        for i in range(self.nb.GetPageCount()):
+            tab = self.nb.GetPage(i)
+            if isinstance(tab, BrowserTab) and tab.profiling != on:
+                tab.set_profiling(on)
+
+    def _profiling(self) -> bool:
+        return self.profiler is not None and self.splitter.IsSplit() and self.splitter.GetWindow2() is self.profiler
 
     def _push_history(self, title: str, url: str) -> None:
-        if url:
-            self.history.appendleft(((title or url)[:128], url))
+        if url and self.history:
+            self.history.visit(url, title if title != url else "")
 
     def _show_history_menu(self, _evt=None) -> None:
-        if not self.history:
+        recent = self.history.recent(HISTORY_MENU_ITEMS) if self.history else []
+        if not recent:
             wx.MessageBox("No history yet.", "History", wx.OK | wx.ICON_INFORMATION, self)
             return
         menu = wx.Menu()
-        for title, url in list(self.history)[:15]:
-            item = menu.Append(wx.ID_ANY, title)
+        for title, url in recent:
+            item = menu.Append(wx.ID_ANY, (title or url)[:128])
             self.Bind(wx.EVT_MENU, lambda _e, u=url: self._history_open(u), item)
         self.PopupMenu(menu)
         menu.Destroy()
@@ -185,77 +375,87 @@ class BrowserFrame(wx.Frame):
         self.SetStatusText("Pick an image…")
         a.start_hover_pick()
 
-    def _on_webmsg(self, data: dict) -> None:
-        t = data.get("type")
-        if t == "pyweb/elementPicked":
-            info = data.get("info") or {}
-            self._request_image_candidates(info)
-        elif t == "pyweb/imageCandidates":
-            urls = [u for u in (data.get("urls") or []) if isinstance(u, str)]
-            if urls:
-                self._prompt_and_queue_urls(urls)
-        elif t == "pyweb/favicon":
-            href = data.get("href")
-            if href:
-                self._apply_favicon_to_active_tab(href)
-
-    def _request_image_candidates(self, info: dict) -> None:
-        a = self._active()
-        if not a: return
-        js = self._build_candidate_js(info)
-        a.eval_js(js)
-
-    def _build_candidate_js(self, info: dict) -> str:
-        el_expr = "null"
-        elem_id = (info.get("id") or "").strip()
-        classes = info.get("classes") or []
-        if elem_id:
-            el_expr = f"document.getElementById({elem_id!r})"
-        elif classes:
-            cls = str(classes[0])
-            el_expr = f"document.querySelector({('.' + cls).encode('unicode_escape').decode('utf-8')!r})"
-        else:
-            el_expr = "document.querySelector('img')"
-
-        sibling_fn = dom_select.SIBLING_IMAGES_JS
-        return (
-            "(function(){"
-            f"var el={el_expr};"
-            "if(!el){el=document.querySelector('img');}"
-            f"var __fn = {sibling_fn};"
-            "var urls = __fn(el);"
-            "if(window.chrome&&window.chrome.webview){window.chrome.webview.postMessage({type:'pyweb/imageCandidates', urls:urls});}"
-            "return true;"
-            "})();"
-        )
+    def _on_element_picked(self, tab: BrowserTab, data: dict) -> None:
+        self._request_image_candidates(tab, data.get("info") or {})
+
+    def _on_image_candidates(self, tab: BrowserTab, data: dict) -> None:
+        urls = [u for u in (data.get("urls") or []) if isinstance(u, str)]
+        self._collect_candidates(tab, urls, bool(data.get("done")))
+
+    def _on_favicon_href(self, tab: BrowserTab, data: dict) -> None:
+        href = data.get("href")
+        if href:
+            self._favicon_cache().request(href, tab)
+
+    def _on_perf(self, tab: BrowserTab, data: dict) -> None:
+        if self.profiler is not None:
+            self.profiler.add(tab, data)
+
+    def _show_message_stats(self, _evt=None) -> None:
+        wx.MessageBox(self.channel.summary(), "Page messages", wx.OK | wx.ICON_INFORMATION, self)
+
+    def _request_image_candidates(self, tab: BrowserTab, info: dict) -> None:
+        self._candidates[tab] = {}
+        self._candidates_seen[tab] = set()
+        tab.page_call("scanImages", {"id": (info.get("id") or "").strip(), "classes": info.get("classes") or []})
+
+    def _collect_candidates(self, tab: BrowserTab, urls: List[str], done: bool) -> None:
+        pending = self._candidates.setdefault(tab, {})
+        seen = self._candidates_seen.setdefault(tab, set())
+        for u in urls:
+            if u not in seen:
+                seen.add(u)
+                pending[u] = None
+        if not pending:
+            if done: self.SetStatusText("No images found")
+            return
+        self.SetStatusText(f"{len(pending)} new images found…")
+        # Batches keep coming while the page scrolls; offer them once they settle
+        delay = 1 if done else CANDIDATE_SETTLE_MS
+        if self._candidate_timer and self._candidate_timer.IsRunning():
+            self._candidate_timer.Stop()
+        self._candidate_timer = wx.CallLater(delay, self._offer_candidates, tab)
+
+    def _offer_candidates(self, tab: BrowserTab) -> None:
+        if self._prompting:
+            return  # re-offered when the open dialog closes
+        urls = list(self._candidates.get(tab) or ())
+        if not urls:
+            return
+        self._candidates[tab] = {}
+        self._prompting = True
+        try:
+            self._prompt_and_queue_urls(urls)
+        finally:
+            self._prompting = False
+        if self._candidates.get(tab):
+            self._candidate_timer = wx.CallLater(CANDIDATE_SETTLE_MS, self._offer_candidates, tab)
 
     def _prompt_and_queue_urls(self, urls: List[str]) -> None:
-        choices = [f"{i+1}. {u}" for i, u in enumerate(urls)]
-        dlg = wx.MultiChoiceDialog(self, "Select images to download", "Images", choices)
+        from ui.image_picker import ImagePickerDialog
+        if self.probe is None:
+            from services.probe import MetadataProbe
+            self.probe = MetadataProbe()
+        dlg = ImagePickerDialog(self, urls, self.probe)
         try:
             if dlg.ShowModal() == wx.ID_OK:
-                for i in dlg.GetSelections():
-                    self.right.add_download(urls[i])
-                if not self.splitter.IsSplit():
+                for url in dlg.GetSelectedUrls():
+                    self._downloads().add_download(url)
+                if not self.splitter.IsSplit() or self.splitter.GetWindow2() is not self.right:
                     self._toggle_downloads()
         finally:
             dlg.Destroy()
 
 
-    def _apply_favicon_to_active_tab(self, href: str) -> None:
-        idx = self.nb.GetSelection()
+    def _apply_favicon(self, tab: BrowserTab, res: Optional[Tuple[str, wx.Image]]) -> None:
+        if not res:
+            return
+        idx = self.nb.FindPage(tab)
         if idx == wx.NOT_FOUND:
             return
-        try:
-            fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(href.split('?')[0])[1] or ".ico")
-            os.close(fd)
-            urllib.request.urlretrieve(href, tmp)
-            img = wx.Image(tmp)
-            if not img.IsOk():
-                return
-            img = img.Scale(TAB_ICON_SIZE[0], TAB_ICON_SIZE[1], wx.IMAGE_QUALITY_HIGH)
-            bmp = wx.Bitmap(img)
-            img_idx = self._tab_images.Add(bmp)
-            self.nb.SetPageImage(idx, img_idx)
-        except Exception:
-            pass
+        digest, img = res
+        # One image-list slot per distinct icon, however many tabs or loads use it
+        slot = self._favicon_slots.get(digest)
+        if slot is None:
+            slot = self._favicon_slots[digest] = self._tab_images.Add(wx.Bitmap(img))
+        self.nb.SetPageImage(idx, slot)
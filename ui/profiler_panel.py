@@ -0,0 +1,176 @@
+import json, os, urllib.parse, wx
+from typing import Callable, Dict, List, Optional
+
+from services.perf import PageProfile, ResourceTiming, to_har
+
+REFRESH_MS = 250     # page reports arrive in bursts while loading; redraw at most this often
+NAME_FRACTION = 0.4  # share of the row width given to the resource name and size
+
+# (phase attribute, colour); bars are drawn in this order from the entry's start
+PHASES = (
+    ("blocked", wx.Colour(150, 150, 150)),
+    ("dns", wx.Colour(0, 150, 136)),
+    ("connect", wx.Colour(255, 152, 0)),
+    ("ttfb", wx.Colour(76, 175, 80)),
+    ("transfer", wx.Colour(33, 150, 243)),
+)
+MILESTONES = (("dcl", wx.Colour(156, 39, 176)), ("load", wx.Colour(229, 57, 53)))   # vertical lines across every row
+
+def _short_name(url: str) -> str:
+    parts = urllib.parse.urlsplit(url)
+    return os.path.basename(parts.path.rstrip('/')) or parts.netloc or url
+
+def _size_text(n: int) -> str:
+    return "" if not n else f"{n / 1024:.0f} KB" if n >= 1024 else f"{n} B"
+
+class WaterfallList(wx.VListBox):
+    """One row per request: name and size on the left, its timing phases as bars on a shared time axis."""
+
+    def __init__(self, parent):
+        super().__init__(parent, style=wx.BORDER_SUNKEN)
+        self.rows: List[ResourceTiming] = []
+        self.span = 1.0
+        self.milestones: Dict[str, float] = {}
+        self.text_colour = wx.BLACK
+        self.Bind(wx.EVT_MOTION, self._on_motion)
+
+    def set_rows(self, rows: List[ResourceTiming], span: float, milestones: Dict[str, float]) -> None:
+        self.rows, self.span, self.milestones = rows, max(span, 1.0), milestones
+        self.SetItemCount(len(rows))
+        self.Refresh()
+
+    def OnMeasureItem(self, n):
+        return self.GetCharHeight() + 6
+
+    def OnDrawItem(self, dc, rect, n):
+        r = self.rows[n]
+        split = int(rect.width * NAME_FRACTION)
+        dc.SetFont(self.GetFont())
+        dc.SetTextForeground(wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHTTEXT) if self.IsSelected(n) else self.text_colour)
+        size = _size_text(r.size)
+        sw = dc.GetTextExtent(size).width if size else 0
+        name = wx.Control.Ellipsize(_short_name(r.name), dc, wx.ELLIPSIZE_MIDDLE, max(10, split - sw - 12))
+        y = rect.y + (rect.height - dc.GetCharHeight()) // 2
+        dc.DrawText(name, rect.x + 4, y)
+        if size:
+            dc.DrawText(size, rect.x + split - sw - 4, y)
+
+        axis = wx.Rect(rect.x + split, rect.y + 3, rect.width - split - 4, rect.height - 6)
+        scale = axis.width / self.span
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        x = r.start
+        if r.ttfb is None:   # no phase detail (cross-origin): one bar for the whole request
+            dc.SetBrush(wx.Brush(PHASES[0][1]))
+            dc.DrawRectangle(axis.x + int(x * scale), axis.y, max(1, int(r.duration * scale)), axis.height)
+        else:
+            for attr, colour in PHASES:
+                ms = getattr(r, attr) or 0.0
+                if ms > 0:
+                    dc.SetBrush(wx.Brush(colour))
+                    dc.DrawRectangle(axis.x + int(x * scale), axis.y, max(1, int(ms * scale)), axis.height)
+                x += ms
+        for key, colour in MILESTONES:
+            at = self.milestones.get(key)
+            if at:
+                dc.SetPen(wx.Pen(colour))
+                mx = axis.x + int(at * scale)
+                dc.DrawLine(mx, rect.y, mx, rect.y + rect.height)
+
+    def _on_motion(self, evt: wx.MouseEvent) -> None:
+        evt.Skip()
+        n = self.VirtualHitTest(evt.GetPosition().y)
+        tip = _tooltip(self.rows[n]) if 0 <= n < len(self.rows) else ""
+        if tip != self.GetToolTipText():
+            if tip: self.SetToolTip(tip)
+            else: self.UnsetToolTip()
+
+def _tooltip(r: ResourceTiming) -> str:
+    lines = [r.name, f"{r.type} · starts {r.start:.0f} ms · {r.duration:.0f} ms"]
+    phases = [f"{attr} {getattr(r, attr):.0f} ms" for attr, _ in PHASES if getattr(r, attr)]
+    if r.tls:
+        phases.append(f"(TLS {r.tls:.0f} ms)")
+    lines.append(", ".join(phases) or "no phase detail (cross-origin)")
+    if r.size or r.body:
+        lines.append(f"{r.size} B transferred, {r.body} B body, {r.decoded} B decoded" + (f" · {r.protocol}" if r.protocol else ""))
+    return "\n".join(lines)
+
+class ProfilerPanel(wx.Panel):
+    """Per-tab page load timing: a summary and a waterfall for the tab on show, exportable as HAR."""
+
+    def __init__(self, parent, theme_getter: Callable):
+        super().__init__(parent)
+        self._get_theme = theme_getter
+        self.profiles: Dict[object, PageProfile] = {}   # BrowserTab → its current document's timing
+        self.tab: Optional[object] = None
+        self._refresh_pending = False
+
+        self.summary = wx.StaticText(self, label="Load a page to see its timing")
+        self.list = WaterfallList(self)
+        ctrls = wx.BoxSizer(wx.HORIZONTAL)
+        self.btn_clear = wx.Button(self, label="Clear")
+        self.btn_export = wx.Button(self, label="Export HAR…")
+        ctrls.Add(self.btn_clear, 0, wx.ALL, 4)
+        ctrls.Add(self.btn_export, 0, wx.ALL, 4)
+        for name, colour in PHASES:
+            key = wx.StaticText(self, label=f"■ {name}")
+            key.SetForegroundColour(colour)
+            ctrls.Add(key, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 2)
+
+        s = wx.BoxSizer(wx.VERTICAL)
+        s.Add(self.summary, 0, wx.EXPAND|wx.ALL, 4)
+        s.Add(self.list, 1, wx.EXPAND|wx.LEFT|wx.RIGHT, 4)
+        s.Add(ctrls, 0)
+        self.SetSizer(s)
+
+        self.btn_clear.Bind(wx.EVT_BUTTON, self._on_clear)
+        self.btn_export.Bind(wx.EVT_BUTTON, self._on_export)
+
+    def apply_theme(self):
+        t = self._get_theme()
+        for w in (self, self.list, self.summary, self.btn_clear, self.btn_export):
+            w.SetBackgroundColour(t.ctrl_bg if w is self.list else t.bg)
+            w.SetForegroundColour(t.ctrl_fg)
+        self.list.text_colour = t.ctrl_fg
+        self.list.Refresh()
+
+    def add(self, tab, msg: dict) -> None:
+        self.profiles.setdefault(tab, PageProfile()).add(msg)
+        if tab is self.tab and not self._refresh_pending:
+            self._refresh_pending = True
+            wx.CallLater(REFRESH_MS, self._refresh)
+
+    def show(self, tab) -> None:
+        self.tab = tab
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self._refresh_pending = False
+        p = self.profiles.get(self.tab)
+        if p is None:
+            self.summary.SetLabel("Load a page to see its timing")
+            self.list.set_rows([], 1.0, {})
+        else:
+            nav = p.navigation
+            self.summary.SetLabel(p.summary_text())
+            self.list.set_rows(p.waterfall(), p.span, {"dcl": nav.dcl, "load": nav.load} if nav else {})
+        self.Layout()
+
+    def _on_clear(self, _):
+        if self.tab is not None:
+            self.profiles.pop(self.tab, None)
+            self._refresh()
+
+    def _on_export(self, _):
+        p = self.profiles.get(self.tab)
+        if p is None: return
+        host = urllib.parse.urlsplit(p.url).netloc or "page"
+        with wx.FileDialog(self, "Export page timing", defaultFile=f"{host}.har",
+                           wildcard="HAR (*.har)|*.har|JSON (*.json)|*.json",
+                           style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT) as dlg:
+            if dlg.ShowModal() != wx.ID_OK: return
+            path = dlg.GetPath()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(to_har([p]), f, indent=2)
+        except OSError as e:
+            wx.MessageBox(str(e), "Export HAR", wx.OK|wx.ICON_ERROR, self)